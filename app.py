@@ -1,8 +1,6 @@
 # app.py
 
 import streamlit as st
-import json
-import pandas as pd
 import os
 
 # 핵심 모듈 import
@@ -10,6 +8,8 @@ from core.data_processor import DataProcessor
 from core.rag_engine import RAGEngine
 from core.db_handler import DatabaseHandler
 from core.summarizer import ChatSummarizer
+from core.session_memory import SessionMemory
+from core.turn_pipeline import TurnPipeline
 
 # 컴포넌트 import
 from components.location_service import LocationService
@@ -24,169 +24,85 @@ st.set_page_config(
     layout="wide"
 )
 
+# 사전 빌드 번들 경로
+BUNDLE_DIR = "data/bundle"
+
 # 데이터 프로세서 및 RAG 엔진 초기화
 @st.cache_resource(show_spinner=True)
 def initialize_rag():
     try:
-        # 현재 작업 디렉토리 확인
-        current_dir = os.getcwd()
-        st.write(f"현재 작업 디렉토리: {current_dir}")
-        
-        data_processor = DataProcessor()
-        
-        # 데이터 파일 경로 설정
-        single_turn_file = "data/total_kor_counsel_bot.jsonl"
-        multi_turn_file = "data/total_kor_multiturn_counsel_bot.jsonl"
-        wellness_file = "data/wellness.csv"
+        # 인코더 백엔드: torch(기본), onnx, onnx-int8 (CPU 전용 호스트에서 더 빠름)
+        data_processor = DataProcessor(
+            backend=os.environ.get("ENCODER_BACKEND", "torch"),
+            num_threads=int(os.environ["ENCODER_THREADS"]) if os.environ.get("ENCODER_THREADS") else None
+        )
+        # 세션별 쿼리 인코딩을 짧은 시간 창 단위로 묶어 처리
+        data_processor.enable_batching(max_wait_ms=5)
+        # 밀집 검색에서 웰니스 행을 가까운 카테고리 m개로 제한 (배포별 설정, benchmark_index.py --route-m 으로 recall 확인)
+        if os.environ.get("WELLNESS_ROUTE_M"):
+            data_processor.configure_routing(int(os.environ["WELLNESS_ROUTE_M"]))
+        # 교차 인코더 재정렬 (선택): 시간 예산(ms)을 넘기면 검색 순서 그대로 사용
+        if os.environ.get("RERANKER_MODEL"):
+            data_processor.enable_reranking(
+                os.environ["RERANKER_MODEL"],
+                budget_ms=float(os.environ.get("RERANK_BUDGET_MS", "150"))
+            )
+        # 자주 반복되는 질문("안녕하세요", "우울해요" 등)의 검색 결과 캐시 (RETRIEVAL_CACHE_SIZE=0 이면 끔)
+        cache_size = int(os.environ.get("RETRIEVAL_CACHE_SIZE", "1024"))
+        if cache_size > 0:
+            data_processor.enable_retrieval_cache(
+                cache_size, ttl_seconds=float(os.environ.get("RETRIEVAL_CACHE_TTL", "600"))
+            )
         
-        # data 디렉토리 존재 확인
-        data_dir = "data"
-        if not os.path.exists(data_dir):
-            st.error(f"데이터 디렉토리를 찾을 수 없습니다: {data_dir}")
-            return None
+        # 사전 빌드된 번들 우선 로드 (python build_index.py 로 생성)
+        if data_processor.load_bundle(BUNDLE_DIR):
+            manifest = data_processor.bundle_manifest
+            st.success(f"번들 로드 완료: {manifest['version']}")
+        else:
+            st.warning("사전 빌드된 번들이 없어 원본 데이터로 초기화합니다. `python build_index.py`로 번들을 만들면 시작이 빨라집니다.")
             
-        # 데이터 디렉토리 내용 확인
-        st.write("데이터 디렉토리 내용:")
-        st.write(os.listdir(data_dir))
-        
-        # 파일 존재 및 권한 확인
-        for file_path in [single_turn_file, multi_turn_file, wellness_file]:
-            exists = os.path.exists(file_path)
-            readable = os.access(file_path, os.R_OK) if exists else False
-            st.write(f"파일: {file_path}")
-            st.write(f"  - 존재 여부: {exists}")
-            st.write(f"  - 읽기 권한: {readable}")
-            if exists:
-                file_size = os.path.getsize(file_path)
-                st.write(f"  - 파일 크기: {file_size:,} bytes")
-
-        # Initialize counseling_data list if not exists
-        if not hasattr(data_processor, 'counseling_data') or not data_processor.counseling_data:
-            data_processor.counseling_data = []
+            # 데이터 파일 경로 설정
+            single_turn_file = "data/total_kor_counsel_bot.jsonl"
+            multi_turn_file = "data/total_kor_multiturn_counsel_bot.jsonl"
+            wellness_file = "data/wellness.csv"
             
-            # 싱글턴 데이터 로드
-            if os.path.exists(single_turn_file):
-                try:
-                    with open(single_turn_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        progress_bar = st.progress(0)
-                        
-                        for i, line in enumerate(lines):
-                            try:
-                                data = json.loads(line.strip())
-                                data_processor.counseling_data.append({
-                                    'input': data['input'],
-                                    'output': data['output'],
-                                    'type': 'single'
-                                })
-                                progress_bar.progress((i + 1) / len(lines))
-                            except json.JSONDecodeError:
-                                st.warning(f"JSON 파싱 오류 (라인 {i+1})")
-                                continue
-                    st.success(f"싱글턴 데이터 로드 완료: {sum(1 for d in data_processor.counseling_data if d['type'] == 'single')}개")
-                except Exception as e:
-                    st.error(f"싱글턴 데이터 로드 중 오류: {str(e)}")
-
-            # 멀티턴 데이터 로드
-            if os.path.exists(multi_turn_file):
-                try:
-                    with open(multi_turn_file, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        for line in lines:
-                            try:
-                                dialogue_data = json.loads(line.strip())
-                                if isinstance(dialogue_data, list):
-                                    processed_input = ""
-                                    processed_output = ""
-                                    current_speaker = None
-                                    current_utterance = ""
-                                    
-                                    for turn in dialogue_data:
-                                        speaker = turn.get('speaker', '')
-                                        utterance = turn.get('utterance', '')
-                                        
-                                        if current_speaker and current_speaker != speaker:
-                                            if current_speaker == "내담자":
-                                                processed_input += f"{current_utterance}\n"
-                                            else:
-                                                processed_output += f"{current_utterance}\n"
-                                            current_utterance = f"{utterance}"
-                                        else:
-                                            current_utterance += f" {utterance}"
-                                        
-                                        current_speaker = speaker
-                                    
-                                    if current_speaker == "내담자":
-                                        processed_input += f"{current_utterance}\n"
-                                    else:
-                                        processed_output += f"{current_utterance}\n"
-                                    
-                                    if processed_input.strip() and processed_output.strip():
-                                        data_processor.counseling_data.append({
-                                            'input': processed_input.strip(),
-                                            'output': processed_output.strip(),
-                                            'type': 'multi'
-                                        })
-                            except (json.JSONDecodeError, KeyError) as e:
-                                st.warning(f"멀티턴 데이터 파싱 오류: {str(e)}")
-                                continue
-                    
-                    st.success(f"멀티턴 데이터 로드 완료: {sum(1 for d in data_processor.counseling_data if d['type'] == 'multi')}개")
-                except Exception as e:
-                    st.error(f"멀티턴 데이터 로드 중 오류: {str(e)}")
-
-            # Wellness 데이터 로드
-            if os.path.exists(wellness_file):
-                try:
-                    wellness_df = pd.read_csv(wellness_file, encoding='utf-8')
-                    
-                    if '유저' in wellness_df.columns and '챗봇' in wellness_df.columns:
-                        for _, row in wellness_df.iterrows():
-                            if pd.notna(row['유저']) and pd.notna(row['챗봇']):
-                                data_processor.counseling_data.append({
-                                    'input': str(row['유저']).strip(),
-                                    'output': str(row['챗봇']).strip(),
-                                    'type': 'wellness',
-                                    'category': row.get('구분', '')
-                                })
-                        
-                        wellness_count = sum(1 for d in data_processor.counseling_data if d['type'] == 'wellness')
-                        if wellness_count > 0:
-                            st.success(f"Wellness 데이터 로드 완료: {wellness_count}개")
-                        else:
-                            st.warning("유효한 Wellness 데이터가 없습니다.")
-                    else:
-                        st.warning("CSV 파일의 필수 컬럼(유저, 챗봇)이 없습니다.")
-                        
-                except Exception as e:
-                    st.warning(f"Wellness 데이터 로드 중 오류: {str(e)}")
-                    st.write("CSV 파일 구조를 확인해주세요. (필요한 컬럼: 구분, 유저, 챗봇)")
+            # data 디렉토리 존재 확인
+            data_dir = "data"
+            if not os.path.exists(data_dir):
+                st.error(f"데이터 디렉토리를 찾을 수 없습니다: {data_dir}")
+                return None
+            
+            # 파일 존재 확인
+            for file_path in [single_turn_file, multi_turn_file, wellness_file]:
+                if not os.path.exists(file_path):
+                    st.warning(f"파일을 찾을 수 없습니다: {file_path}")
+            
+            with st.spinner("상담 데이터를 불러오는 중..."):
+                if not data_processor.load_counseling_data(single_turn_file, multi_turn_file, wellness_file):
+                    st.error("상담 데이터 로드 실패")
+                    return None
 
-            # FAISS 인덱스 처리
-            if os.path.exists("data/faiss_index.idx"):
-                data_processor.load_index("data/faiss_index.idx")
+            # FAISS 인덱스 처리 (매니페스트가 원본과 맞지 않으면 변경분만 다시 임베딩)
+            if data_processor.load_index("data/faiss_index.idx"):
                 st.success("기존 인덱스 로드 완료")
             else:
-                if data_processor.create_embeddings():
-                    data_processor.save_index("data/faiss_index.idx")
-                    st.success("새 인덱스 생성 완료")
-                else:
-                    st.error("인덱스 생성 실패")
-                    return None
+                with st.spinner("인덱스를 생성하는 중..."):
+                    if data_processor.create_embeddings():
+                        data_processor.save_index("data/faiss_index.idx")
+                        st.success("새 인덱스 생성 완료")
+                    else:
+                        st.error("인덱스 생성 실패")
+                        return None
 
-            # 데이터 로드 상태 표시
-            total_data = len(data_processor.counseling_data)
-            single_turn_count = sum(1 for d in data_processor.counseling_data if d.get('type') == 'single')
-            multi_turn_count = sum(1 for d in data_processor.counseling_data if d.get('type') == 'multi')
-            wellness_count = sum(1 for d in data_processor.counseling_data if d.get('type') == 'wellness')
-            
-            st.success(f"""
-            📊 데이터 현황:
-            - 싱글턴 데이터: {single_turn_count}개
-            - 멀티턴 데이터: {multi_turn_count}개
-            - Wellness 데이터: {wellness_count}개
-            - 총 데이터: {total_data}개
-            """)
+        # 데이터 로드 상태 표시
+        counts = data_processor.get_type_counts()
+        st.success(f"""
+        📊 데이터 현황:
+        - 싱글턴 데이터: {counts.get('single', 0)}개
+        - 멀티턴 데이터: {counts.get('multi', 0)}개
+        - Wellness 데이터: {counts.get('wellness', 0)}개
+        - 총 데이터: {len(data_processor.counseling_data)}개
+        """)
 
         # OPENAI_API_KEY 확인
         api_key = st.secrets.get("OPENAI_API_KEY")
@@ -195,6 +111,8 @@ def initialize_rag():
             return None
 
         # RAG 엔진 초기화
+        # crisis_detector 는 넘기지 않음: 위기 상황이면 대체 응답 여부와 관계없이 턴 처리 후
+        # get_crisis_information(긴급 연락처 + 주변 상담센터)을 한 번만 덧붙인다
         rag_engine = RAGEngine(data_processor, api_key)
         st.success("RAG 엔진 초기화 완료")
         
@@ -293,6 +211,19 @@ def main():
             rag_engine = initialize_rag()
             if rag_engine:
                 st.session_state.rag_engine = rag_engine
+                # 턴 처리 파이프라인 (감정 분석·위기 감지·저장과 검색·응답 생성을 동시에 실행)
+                # 오래된 대화는 N턴마다 백그라운드에서 누적 요약해 프롬프트 크기를 일정하게 유지
+                st.session_state.session_memory = SessionMemory(
+                    ChatSummarizer(st.secrets["OPENAI_API_KEY"]),
+                    update_every_turns=int(os.environ.get("SUMMARY_EVERY_TURNS", "3"))
+                )
+                st.session_state.turn_pipeline = TurnPipeline(
+                    rag_engine,
+                    st.session_state.components['emotion_analyzer'],
+                    st.session_state.db_handler,
+                    detect_crisis,
+                    memory=st.session_state.session_memory
+                )
                 st.session_state.initialized = True
             else:
                 st.error("시스템 초기화에 실패했습니다.")
@@ -311,67 +242,71 @@ def main():
 
     # 사용자 입력 처리
     if prompt := st.chat_input("고민이나 감정을 이야기해주세요..."):
-         # 1. 감정 분석 수행
-        emotion_result = st.session_state.components['emotion_analyzer'].analyze_emotion(prompt)
-        st.session_state.emotion_result = emotion_result
-        
-        # 2. 감정 결과 추출
-        emotion_detected = emotion_result.get('dominant_emotion') if emotion_result else None
-        
-        # 3. 위기 상황 감지
-        crisis_detected = detect_crisis(prompt)
-        
-        # 4. 사용자 메시지 저장
-        message_id = st.session_state.db_handler.save_message(
-            session_id=st.session_state.current_session_id,
-            role="user",
-            content=prompt,
-            emotion_detected=emotion_detected,
-            crisis_detected=crisis_detected
-        )
-        
-        # 5. 감정에 따른 테마 적용
-        if emotion_detected:
-            st.session_state.components['theme_manager'].apply_theme(emotion_detected)
-        
-        # 6. 메시지 목록에 추가
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "emotion_detected": emotion_detected,
-            "crisis_detected": crisis_detected
-        })
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # 7. 챗봇 응답 생성
-        if crisis_detected:
-            # 위기 상황 처리
-            location_service = st.session_state.components['location_service']
-            location_data = location_service.get_current_location_by_ip()
-            crisis_info = get_crisis_information(location_data, location_service)
-            response = f"{st.session_state.rag_engine.get_response(prompt, st.session_state.messages)}\n\n{crisis_info}"
-        else:
-            response = st.session_state.rag_engine.get_response(prompt, st.session_state.messages)
-        
-        # 8. 어시스턴트 메시지 저장
-        st.session_state.db_handler.save_message(
-            session_id=st.session_state.current_session_id,
-            role="assistant",
-            content=response,
-            emotion_detected=None,  # 챗봇 응답은 감정 분석하지 않음
-            crisis_detected=crisis_detected
-        )
-        
-        # 9. 어시스턴트 메시지 표시
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": response,
-            "emotion_detected": None,
-            "crisis_detected": crisis_detected
-        })
+        # 1~4. 감정 분석, 위기 감지, 사용자 메시지 저장과 유사 사례 검색, 응답 생성을 겹쳐 실행
         with st.chat_message("assistant"):
-            st.markdown(response)
+            placeholder = st.empty()
+            streamed = []
+
+            def show_token(token):
+                # 토큰이 도착하는 대로 표시해 첫 토큰까지만 기다리게 함
+                streamed.append(token)
+                placeholder.markdown("".join(streamed) + "▌")
+
+            turn = st.session_state.turn_pipeline.run(
+                prompt,
+                st.session_state.messages + [{"role": "user", "content": prompt}],
+                st.session_state.current_session_id,
+                show_token
+            )
+            response = turn['response']
+            placeholder.markdown(response)
+            st.session_state.turn_timings = turn['timings']
+            
+            # 5. 감정 결과와 위기 감지 결과 추출 (작업 스레드의 감정 분석 오류는 여기서 표시)
+            if 'emotion' in turn['errors']:
+                st.error(f"감정 분석 중 오류 발생: {turn['errors']['emotion']}")
+            emotion_result = turn['emotion_result']
+            st.session_state.emotion_result = emotion_result
+            emotion_detected = turn['emotion_detected']
+            crisis_detected = turn['crisis_detected']
+            if crisis_detected:
+                # 위기 상황 처리 (대체 응답 포함 모든 응답에 긴급 연락처를 여기서만 추가)
+                location_service = st.session_state.components['location_service']
+                location_data = location_service.get_current_location_by_ip()
+                crisis_info = get_crisis_information(location_data, location_service)
+                st.markdown(crisis_info)
+                response = f"{response}\n\n{crisis_info}"
+            
+            # 6. 감정에 따른 테마 적용
+            if emotion_detected:
+                st.session_state.components['theme_manager'].apply_theme(emotion_detected)
+            
+            # 7. 어시스턴트 메시지 저장 (스트림이 끝난 뒤 최종 텍스트)
+            st.session_state.db_handler.save_message(
+                session_id=st.session_state.current_session_id,
+                role="assistant",
+                content=response,
+                emotion_detected=None,  # 챗봇 응답은 감정 분석하지 않음
+                crisis_detected=crisis_detected
+            )
+            
+            # 8. 메시지 목록에 추가
+            st.session_state.messages.append({
+                "role": "user",
+                "content": prompt,
+                "emotion_detected": emotion_detected,
+                "crisis_detected": crisis_detected
+            })
+            st.session_state.messages.append({
+                "role": "assistant",
+                "content": response,
+                "emotion_detected": None,
+                "crisis_detected": crisis_detected
+            })
+            st.session_state.session_memory.maybe_update(st.session_state.messages)
             
             # 마지막 인사를 포함하는 응답인 경우 요약본 생성
             if "함께 이야기 나눌 수 있어 좋았습니다" in response:
@@ -421,6 +356,11 @@ def main():
                 st.session_state.components['emotion_analyzer'].display_emotion_analysis(
                     st.session_state.emotion_result
                 )
+        # 마지막 턴 단계별 처리 시간
+        if st.session_state.get('turn_timings'):
+            with st.expander("⏱️ 응답 처리 시간"):
+                for stage, elapsed in st.session_state.turn_timings.items():
+                    st.write(f"{stage}: {elapsed:.0f}ms")
         # 위치 서비스는 별도의 탭으로 분리
         st.markdown("---")  # 구분선 추가
         st.subheader("📍 주변 상담센터 찾기")
@@ -0,0 +1,104 @@
+# benchmark_index.py
+"""인덱스 유형별 검색 지연 시간과 recall 비교
+
+현재 번들(data/bundle)의 임베딩으로 각 인덱스를 만들고, flat(정확 검색) 결과 대비
+recall@k 와 단건 쿼리 지연 시간(p50/p95), 인덱스 크기와 압축률, 번들 전체 크기를 출력합니다.
+번들 크기는 코퍼스·어휘 색인 등 나머지 파일에 인덱스를 더하고, 재정렬(rerank_factor)을 쓰는 경우에만
+float32 임베딩을 더한 값입니다 (build_index.py --no-embeddings 기준).
+--route-m 을 주면 웰니스 카테고리 라우팅(상위 m개 카테고리만 검색)을 카테고리 전체 검색과 비교합니다.
+
+사용법:
+    python benchmark_index.py
+    python benchmark_index.py --types ivf_flat hnsw --k 5 --queries 500
+    python benchmark_index.py --types flat --route-m 1 2 4 8
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from core.data_processor import DataProcessor
+from core.index_factory import INDEX_TYPES, benchmark_index_types
+from core.corpus_store import load_corpus
+from core.category_router import CategoryRouter, evaluate_routing
+
+
+def path_size(path: str) -> int:
+    """파일 또는 디렉토리 전체 크기(바이트)"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="인덱스 유형별 성능 비교")
+    parser.add_argument("--bundle", default="data/bundle", help="번들 디렉토리")
+    parser.add_argument("--types", nargs="+", default=[t for t in INDEX_TYPES if t != 'flat'],
+                        choices=list(INDEX_TYPES), help="비교할 인덱스 유형")
+    parser.add_argument("--queries", type=int, default=200, help="평가 쿼리 수 (코퍼스에서 샘플링)")
+    parser.add_argument("--k", type=int, default=10, help="recall@k 의 k")
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 4, 16, 64], help="IVF nprobe 측정값")
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[16, 64, 256], help="HNSW efSearch 측정값")
+    parser.add_argument("--rerank", type=int, nargs="*", default=[0, 4, 10], help="압축 인덱스 재정렬 배수 측정값")
+    parser.add_argument("--route-m", type=int, nargs="*", default=[], help="카테고리 라우팅 m 측정값")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    current = DataProcessor.read_bundle_manifest(args.bundle)
+    if current is None:
+        print("번들이 없습니다. 먼저 python build_index.py 를 실행하세요.")
+        return 1
+    bundle_dir, manifest = current
+    if not manifest['files'].get('embeddings'):
+        print("임베딩 없이 저장된 번들입니다. --no-embeddings 없이 다시 빌드한 번들로 비교하세요.")
+        return 1
+    embeddings = np.load(f"{bundle_dir}/{manifest['files']['embeddings']}", mmap_mode='r')
+    print(f"번들: {bundle_dir} ({embeddings.shape[0]}행, {embeddings.shape[1]}차원)")
+    file_sizes = {
+        name: path_size(os.path.join(bundle_dir, file_name))
+        for name, file_name in manifest['files'].items() if file_name
+    }
+    print(f"번들 크기: {sum(file_sizes.values()) / 1e6:.2f}MB ("
+          + ", ".join(f"{name} {size / 1e6:.2f}MB" for name, size in file_sizes.items()) + ")")
+    other_bytes = sum(size for name, size in file_sizes.items() if name not in ('index', 'embeddings'))
+
+    results = benchmark_index_types(
+        np.asarray(embeddings), args.types, args.queries, args.k,
+        nprobe_values=args.nprobe, ef_search_values=args.ef_search, rerank_values=args.rerank
+    )
+    print(f"{'유형':<10} {'recall@' + str(args.k):>10} {'p50(ms)':>9} {'p95(ms)':>9} {'크기(MB)':>9} "
+          f"{'압축률':>6} {'번들(MB)':>9} {'빌드(s)':>8}  파라미터")
+    for result in results:
+        bundle_bytes = other_bytes + result['size_bytes']
+        if result['params'].get('rerank_factor'):
+            bundle_bytes += embeddings.nbytes
+        print(f"{result['index_type']:<10} {result['recall']:>10.3f} {result['latency_ms_p50']:>9.3f} "
+              f"{result['latency_ms_p95']:>9.3f} {result['size_bytes'] / 1e6:>9.2f} "
+              f"{result['compression']:>5.1f}x {bundle_bytes / 1e6:>9.2f} {result['build_seconds']:>8.2f}  "
+              f"{result['params']}")
+
+    if args.route_m:
+        category_codes = load_corpus(os.path.join(bundle_dir, manifest['files']['corpus'])).category_codes
+        router_dir = manifest['files'].get('router')
+        if router_dir:
+            router = CategoryRouter.load(os.path.join(bundle_dir, router_dir), category_codes)
+        else:
+            router = CategoryRouter.build(embeddings, category_codes)
+        if not len(router):
+            print("카테고리가 있는 행이 없어 라우팅을 평가할 수 없습니다.")
+            return 1
+        print(f"\n카테고리 라우팅: {len(router)}개 카테고리, {router.num_members}행")
+        print(f"{'m':>5} {'recall@' + str(args.k):>10} {'p50(ms)':>9} {'p95(ms)':>9} {'탐색 비율':>9}")
+        for result in evaluate_routing(router, embeddings, args.route_m, args.queries, args.k):
+            m = '전체' if result['m'] is None else str(result['m'])
+            print(f"{m:>5} {result['recall']:>10.3f} {result['latency_ms_p50']:>9.3f} "
+                  f"{result['latency_ms_p95']:>9.3f} {result['scanned_fraction']:>9.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
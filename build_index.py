@@ -0,0 +1,137 @@
+# build_index.py
+"""상담 데이터 번들 오프라인 빌드
+
+코퍼스 정규화, 임베딩 생성, FAISS 인덱스 생성을 Streamlit 밖에서 수행하고
+앱이 바로 로드할 수 있는 버전별 번들(data/bundle/<버전>/)로 저장합니다.
+
+사용법:
+    python build_index.py
+    python build_index.py --data-dir data --out data/bundle
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from core.data_processor import DataProcessor, ENCODER_BACKENDS
+from core.index_factory import INDEX_TYPES
+
+
+def bundle_layout(corpus_format: str, block_rows: Optional[int], embeddings: bool) -> Dict:
+    """번들 저장 구성 (원본이 같아도 구성이 바뀌면 다시 저장)"""
+    return {
+        'corpus_format': corpus_format,
+        'block_rows': block_rows if corpus_format == 'blocks' else None,
+        'embeddings': embeddings
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="상담 데이터 번들 빌드")
+    parser.add_argument("--data-dir", default="data", help="원본 데이터 디렉토리")
+    parser.add_argument("--out", default="data/bundle", help="번들 저장 디렉토리")
+    parser.add_argument("--model", default="jhgan/ko-sbert-nli", help="임베딩 모델 이름")
+    parser.add_argument("--backend", default="torch", choices=list(ENCODER_BACKENDS), help="인코더 추론 백엔드")
+    parser.add_argument("--threads", type=int, help="인코더 추론 스레드 수")
+    parser.add_argument("--workers", type=int, help="전체 빌드 시 인코딩 프로세스 수 (지정 시 병렬·재개 가능 빌드)")
+    parser.add_argument("--shard-size", type=int, default=2048, help="병렬 빌드 샤드당 행 수")
+    parser.add_argument("--checkpoint-dir", default="data/build_checkpoint", help="병렬 빌드 체크포인트 디렉토리")
+    parser.add_argument("--corpus-format", default="columnar", choices=["columnar", "blocks"],
+                        help="코퍼스 저장 형식 (blocks: 행 블록 압축, 메모리보다 큰 코퍼스용)")
+    parser.add_argument("--block-rows", type=int, default=64, help="압축 블록당 행 수")
+    parser.add_argument("--dedup", action="store_true", help="유사 중복 사례를 대표 사례로 합침 (대체 응답 보관)")
+    parser.add_argument("--dedup-jaccard", type=float, default=0.8, help="중복 판정 입력 텍스트 MinHash 자카드 임계값")
+    parser.add_argument("--dedup-cosine", type=float, default=0.95, help="중복 판정 임베딩 코사인 임계값")
+    parser.add_argument("--full", action="store_true", help="이전 번들을 재사용하지 않고 전체 재임베딩")
+    parser.add_argument("--index-type", default="flat", choices=list(INDEX_TYPES), help="FAISS 인덱스 유형")
+    parser.add_argument("--nlist", type=int, help="IVF 클러스터 수 (기본: 약 4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, help="IVF 기본 탐색 클러스터 수")
+    parser.add_argument("--m", type=int, help="PQ 서브벡터 수")
+    parser.add_argument("--nbits", type=int, help="PQ 서브벡터당 비트 수")
+    parser.add_argument("--hnsw-m", dest="M", type=int, help="HNSW 이웃 수")
+    parser.add_argument("--ef-search", type=int, help="HNSW 기본 efSearch")
+    parser.add_argument("--rerank-factor", type=int, help="압축 인덱스 후보 배수 (float32 임베딩으로 재정렬)")
+    parser.add_argument("--no-embeddings", action="store_true",
+                        help="float32 임베딩을 번들에 저장하지 않음 (재정렬 없는 압축 인덱스의 디스크/메모리 절감)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+
+    single_turn_file = os.path.join(args.data_dir, "total_kor_counsel_bot.jsonl")
+    multi_turn_file = os.path.join(args.data_dir, "total_kor_multiturn_counsel_bot.jsonl")
+    wellness_file = os.path.join(args.data_dir, "wellness.csv")
+
+    start = time.time()
+    data_processor = DataProcessor(model_name=args.model, backend=args.backend, num_threads=args.threads)
+    data_processor.configure_index(
+        args.index_type, nlist=args.nlist, nprobe=args.nprobe, m=args.m, nbits=args.nbits,
+        M=args.M, ef_search=args.ef_search, rerank_factor=args.rerank_factor
+    )
+    if args.dedup:
+        data_processor.configure_dedup(args.dedup_jaccard, args.dedup_cosine)
+
+    if not data_processor.load_counseling_data(single_turn_file, multi_turn_file, wellness_file):
+        print("상담 데이터를 불러오지 못했습니다.")
+        return 1
+    counts = data_processor.get_type_counts()
+    print(f"코퍼스 로드 완료: {len(data_processor.counseling_data)}개 {counts} ({time.time() - start:.1f}s)")
+
+    previous = None if args.full else data_processor.read_bundle_manifest(args.out)
+    if previous:
+        bundle_dir, manifest = previous
+        problems = data_processor.check_manifest(manifest)
+        # 재정렬을 쓰는 인덱스(sq8, pq 등)는 --no-embeddings 여도 임베딩을 저장하므로 save_bundle 과 같은 규칙으로 비교
+        layout = bundle_layout(args.corpus_format, args.block_rows,
+                               data_processor.bundle_saves_embeddings(not args.no_embeddings))
+        previous_layout = bundle_layout(manifest.get('corpus_format', 'columnar'), manifest.get('block_rows'),
+                                        bool(manifest['files'].get('embeddings')))
+        if layout != previous_layout:
+            problems.append(f"번들 구성 변경: {previous_layout} -> {layout}")
+        if not problems:
+            print(f"원본 변경 없음: 현재 번들 유지 ({bundle_dir})")
+            return 0
+        print(f"이전 번들과 차이: {', '.join(problems)}")
+    if previous and manifest['files'].get('embeddings'):
+        # 이전 번들과 해시가 같은 소스는 임베딩 재사용 (임베딩 없이 저장된 번들은 전체 생성)
+        previous_embeddings = np.load(os.path.join(bundle_dir, manifest['files']['embeddings']), mmap_mode='r')
+        reembedded = data_processor.update_embeddings(manifest, previous_embeddings)
+        if reembedded is None:
+            print("임베딩 갱신 실패")
+            return 1
+        print(f"다시 임베딩한 소스: {reembedded} ({time.time() - start:.1f}s)")
+    elif args.workers:
+        # 중단되면 같은 명령으로 다시 실행해 마지막 완료 샤드 이후부터 재개
+        if not data_processor.create_embeddings_parallel(args.checkpoint_dir, args.workers, args.shard_size):
+            print("임베딩 생성 실패 (다시 실행하면 완료된 샤드부터 재개합니다)")
+            return 1
+        print(f"병렬 임베딩 생성 완료 ({time.time() - start:.1f}s)")
+    else:
+        if not data_processor.create_embeddings():
+            print("임베딩 생성 실패")
+            return 1
+        print(f"임베딩 생성 완료 ({time.time() - start:.1f}s)")
+
+    if args.dedup:
+        if data_processor.deduplicate() is None:
+            print("중복 제거 실패")
+            return 1
+        print(f"중복 제거 완료 ({time.time() - start:.1f}s)")
+
+    bundle_dir = data_processor.save_bundle(args.out, args.corpus_format, args.block_rows,
+                                            save_embeddings=not args.no_embeddings)
+    if not bundle_dir:
+        return 1
+    print(f"번들 저장 완료: {bundle_dir} ({time.time() - start:.1f}s)")
+    if args.workers and os.path.exists(args.checkpoint_dir):
+        shutil.rmtree(args.checkpoint_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
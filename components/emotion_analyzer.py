@@ -37,7 +37,11 @@ class EmotionAnalyzer:
         self.intensifiers = ["매우", "너무", "정말", "진짜", "완전", "아주"]
 
     def analyze_emotion(self, text: str):
-        """텍스트의 감정 분석"""
+        """텍스트의 감정 분석
+
+        실패하면 {'error': 오류 메시지}를 반환한다. 턴 파이프라인의 작업 스레드에서 호출되므로
+        Streamlit 요소를 직접 그리지 않고, 오류 표시는 스크립트 스레드(app.py)에서 한다.
+        """
         try:
             # BERT 모델을 통한 기본 감정 분석
             result = self.classifier(text)[0]
@@ -68,8 +72,8 @@ class EmotionAnalyzer:
             }
             
         except Exception as e:
-            st.error(f"감정 분석 중 오류 발생: {str(e)}")
-            return None
+            print(f"감정 분석 중 오류 발생: {str(e)}")
+            return {'error': str(e)}
 
     def _analyze_keywords(self, text):
         """키워드 기반 감정 분석"""
@@ -0,0 +1,123 @@
+# core/category_router.py
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+from core.index_factory import exact_subset_search, recall_at_k
+
+ROUTER_CENTROIDS = "centroids.npy"
+ROUTER_CHUNK_ROWS = 65536
+
+
+class CategoryRouter:
+    """카테고리 중심 벡터 기반 2단계 검색
+
+    1단계에서 쿼리와 가까운 카테고리 중심 m개를 고르고, 2단계에서 해당 카테고리에 속한 행만
+    원본 벡터로 정확 검색한다. 카테고리별 행 번호는 category_codes 로부터 CSR 형태로 만든다.
+    """
+
+    def __init__(self, centroids: np.ndarray, category_codes: np.ndarray):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        codes = np.asarray(category_codes)
+        categorized = np.flatnonzero(codes >= 0)
+        order = np.argsort(codes[categorized], kind='stable')
+        self.member_ids = categorized[order].astype(np.int64)
+        self.member_offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[categorized], minlength=len(self.centroids)), out=self.member_offsets[1:])
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+
+    def __len__(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def num_members(self) -> int:
+        return len(self.member_ids)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, category_codes: np.ndarray) -> 'CategoryRouter':
+        """카테고리별 평균 임베딩 계산 (카테고리 행만 구간별로 읽음)"""
+        codes = np.asarray(category_codes)
+        num_categories = int(codes.max()) + 1 if len(codes) and codes.max() >= 0 else 0
+        sums = np.zeros((num_categories, embeddings.shape[1]), dtype=np.float64)
+        categorized = np.flatnonzero(codes >= 0)
+        for start in range(0, len(categorized), ROUTER_CHUNK_ROWS):
+            rows = categorized[start:start + ROUTER_CHUNK_ROWS]
+            np.add.at(sums, codes[rows], np.asarray(embeddings[rows], dtype=np.float64))
+        counts = np.bincount(codes[categorized], minlength=num_categories)
+        return cls(sums / np.maximum(counts, 1)[:, None], codes)
+
+    def save(self, router_dir: str):
+        os.makedirs(router_dir, exist_ok=True)
+        np.save(os.path.join(router_dir, ROUTER_CENTROIDS), self.centroids)
+
+    @classmethod
+    def load(cls, router_dir: str, category_codes: np.ndarray) -> 'CategoryRouter':
+        return cls(np.load(os.path.join(router_dir, ROUTER_CENTROIDS)), category_codes)
+
+    def route(self, query_vectors: np.ndarray, m: int) -> np.ndarray:
+        """쿼리별로 가장 가까운 카테고리 m개 (가까운 순)"""
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        m = max(1, min(m, len(self.centroids)))
+        distances = self._centroid_norms - 2 * queries @ self.centroids.T
+        top = np.argpartition(distances, m - 1, axis=1)[:, :m]
+        order = np.argsort(np.take_along_axis(distances, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def members(self, categories) -> np.ndarray:
+        """카테고리들에 속한 행 번호 (정렬됨)"""
+        return np.sort(np.concatenate([
+            self.member_ids[self.member_offsets[code]:self.member_offsets[code + 1]] for code in categories
+        ]))
+
+    def search(self, query_vectors: np.ndarray, k: int, m: int, embeddings: np.ndarray) -> tuple:
+        """상위 m개 카테고리의 행만 검색, (distances, ids) 반환"""
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, categories in enumerate(self.route(queries, m)):
+            row_distances, row_ids = exact_subset_search(queries[row:row + 1], self.members(categories), embeddings, k)
+            distances[row], ids[row] = row_distances[0], row_ids[0]
+        return distances, ids
+
+
+def evaluate_routing(router: CategoryRouter, embeddings: np.ndarray, m_values: List[int],
+                     num_queries: int = 200, k: int = 10, seed: int = 1234,
+                     queries: Optional[np.ndarray] = None) -> List[Dict]:
+    """카테고리 행 전체 정확 검색 대비 라우팅 검색의 recall@k, 지연 시간, 탐색 행 비율
+
+    queries 를 주지 않으면 카테고리 행에서 샘플링한다.
+    """
+    if queries is None:
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(router.member_ids, size=min(num_queries, router.num_members), replace=False))
+        queries = np.asarray(embeddings[rows], dtype=np.float32)
+    all_members = np.sort(router.member_ids)
+
+    def timed(search) -> tuple:
+        latencies, results = [], []
+        for query in queries:
+            start = time.perf_counter()
+            results.append(search(query.reshape(1, -1))[1][0])
+            latencies.append((time.perf_counter() - start) * 1000)
+        return np.vstack(results), latencies
+
+    exact_ids, full_latencies = timed(lambda query: exact_subset_search(query, all_members, embeddings, k))
+    results = [{
+        'm': None,
+        'recall': 1.0,
+        'latency_ms_p50': float(np.percentile(full_latencies, 50)),
+        'latency_ms_p95': float(np.percentile(full_latencies, 95)),
+        'scanned_fraction': 1.0
+    }]
+    for m in m_values:
+        routed_ids, latencies = timed(lambda query: router.search(query, k, m, embeddings))
+        scanned = [len(router.members(categories)) for categories in router.route(queries, m)]
+        results.append({
+            'm': m,
+            'recall': recall_at_k(routed_ids, exact_ids),
+            'latency_ms_p50': float(np.percentile(latencies, 50)),
+            'latency_ms_p95': float(np.percentile(latencies, 95)),
+            'scanned_fraction': float(np.mean(scanned)) / max(router.num_members, 1)
+        })
+    return results
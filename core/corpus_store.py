@@ -0,0 +1,330 @@
+# core/corpus_store.py
+import os
+import json
+import zlib
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+CORPUS_META = "corpus_meta.json"
+# 컬럼 파일 (모두 .npy, 읽기 시 메모리 매핑)
+CORPUS_COLUMNS = ('input_arena', 'input_offsets', 'output_arena', 'output_offsets', 'type_codes', 'category_codes')
+# 중복 제거로 합쳐진 대체 응답 (구분자로 이어 붙임, 없으면 빈 문자열, 이전 코퍼스에는 없음)
+ALTERNATIVE_COLUMNS = ('alternatives_arena', 'alternatives_offsets')
+ALTERNATIVE_SEPARATOR = '\x1e'
+# 블록 압축 코퍼스 파일
+BLOCKS_FILE = "rows.blocks"
+BLOCK_COLUMNS = ('block_offsets', 'type_codes', 'category_codes')
+TYPE_NAMES = ['single', 'multi', 'wellness']
+NO_CATEGORY = -1
+
+
+class CorpusBuilder:
+    """행 단위로 추가하며 컬럼형 코퍼스를 만드는 빌더 (행마다 dict 를 만들지 않음)"""
+
+    def __init__(self):
+        self._input = bytearray()
+        self._output = bytearray()
+        self._alternatives = bytearray()
+        self._input_offsets = array('q', [0])
+        self._output_offsets = array('q', [0])
+        self._alternatives_offsets = array('q', [0])
+        self._type_codes = array('B')
+        self._category_codes = array('i')
+        self._types = {name: code for code, name in enumerate(TYPE_NAMES)}
+        self._categories = {}
+
+    def __len__(self) -> int:
+        return len(self._type_codes)
+
+    def append(self, input: str, output: str, type: str, category: Optional[str] = None,
+               alternatives: Optional[List[str]] = None):
+        self._input += input.encode('utf-8')
+        self._output += output.encode('utf-8')
+        if alternatives:
+            self._alternatives += ALTERNATIVE_SEPARATOR.join(alternatives).encode('utf-8')
+        self._input_offsets.append(len(self._input))
+        self._output_offsets.append(len(self._output))
+        self._alternatives_offsets.append(len(self._alternatives))
+        self._type_codes.append(self._types.setdefault(type, len(self._types)))
+        if category is None:
+            self._category_codes.append(NO_CATEGORY)
+        else:
+            self._category_codes.append(self._categories.setdefault(category, len(self._categories)))
+
+    def build(self) -> 'ColumnarCorpus':
+        return ColumnarCorpus(
+            {
+                'input_arena': np.frombuffer(bytes(self._input), dtype=np.uint8),
+                'input_offsets': np.frombuffer(self._input_offsets, dtype=np.int64).copy(),
+                'output_arena': np.frombuffer(bytes(self._output), dtype=np.uint8),
+                'output_offsets': np.frombuffer(self._output_offsets, dtype=np.int64).copy(),
+                'alternatives_arena': np.frombuffer(bytes(self._alternatives), dtype=np.uint8),
+                'alternatives_offsets': np.frombuffer(self._alternatives_offsets, dtype=np.int64).copy(),
+                'type_codes': np.frombuffer(self._type_codes, dtype=np.uint8).copy(),
+                'category_codes': np.frombuffer(self._category_codes, dtype=np.int32).copy(),
+            },
+            list(self._types),
+            list(self._categories)
+        )
+
+
+class _CorpusBase(Sequence, ABC):
+    """코퍼스 공통 동작: 행 조회, 유형/카테고리 코드, 유형별 개수"""
+
+    def __init__(self, type_codes: np.ndarray, category_codes: np.ndarray, type_names: List[str],
+                 category_names: List[str]):
+        self._type_codes = type_codes
+        self._category_codes = category_codes
+        self.type_names = type_names
+        self.category_names = category_names
+        self._type_counts = {
+            name: int(count)
+            for name, count in zip(type_names, np.bincount(type_codes, minlength=len(type_names)))
+        }
+
+    def __len__(self) -> int:
+        return len(self._type_codes)
+
+    @abstractmethod
+    def _texts(self, index: int) -> tuple:
+        """(입력, 응답) 문자열 (저장 형식별로 구현)"""
+
+    def _alternatives(self, index: int) -> List[str]:
+        """중복 제거로 합쳐진 대체 응답 목록"""
+        return []
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        input_text, output_text = self._texts(index)
+        row = {
+            'input': input_text,
+            'output': output_text,
+            'type': self.type_names[self._type_codes[index]]
+        }
+        category_code = self._category_codes[index]
+        if category_code != NO_CATEGORY:
+            row['category'] = self.category_names[category_code]
+        alternatives = self._alternatives(index)
+        if alternatives:
+            row['alternatives'] = alternatives
+        return row
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def inputs(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """입력 텍스트만 디코딩 (임베딩 생성용)"""
+        end = len(self) if end is None else end
+        return [self._texts(index)[0] for index in range(start, end)]
+
+    def type_counts(self) -> Dict[str, int]:
+        """유형별 행 수 (생성 시 미리 계산)"""
+        return dict(self._type_counts)
+
+    def filter_mask(self, types: Optional[List[str]] = None,
+                    categories: Optional[List[str]] = None) -> Optional[np.ndarray]:
+        """유형/카테고리 조건에 맞는 행의 불리언 마스크 (조건이 없으면 None)
+
+        코드 컬럼만 비교하므로 텍스트는 읽지 않는다. 없는 이름은 어떤 행과도 일치하지 않는다.
+        """
+        if not types and not categories:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if types:
+            types = set(types)
+            mask &= np.isin(self._type_codes, [code for code, name in enumerate(self.type_names) if name in types])
+        if categories:
+            categories = set(categories)
+            mask &= np.isin(self._category_codes,
+                            [code for code, name in enumerate(self.category_names) if name in categories])
+        return mask
+
+    @property
+    def type_codes(self) -> np.ndarray:
+        return self._type_codes
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        return self._category_codes
+
+    def _write_meta(self, corpus_dir: str, corpus_format: str, **extra):
+        with open(os.path.join(corpus_dir, CORPUS_META), 'w', encoding='utf-8') as f:
+            json.dump(dict({
+                'format': corpus_format,
+                'num_rows': len(self),
+                'type_names': self.type_names,
+                'category_names': self.category_names
+            }, **extra), f, ensure_ascii=False, indent=2)
+
+
+def load_corpus(corpus_dir: str, hot_blocks: int = 64) -> _CorpusBase:
+    """저장된 코퍼스를 형식에 맞게 메모리 매핑으로 열기"""
+    with open(os.path.join(corpus_dir, CORPUS_META), 'r', encoding='utf-8') as f:
+        corpus_format = json.load(f).get('format', 'columnar')
+    if corpus_format == 'blocks':
+        return BlockCorpus.load(corpus_dir, hot_blocks)
+    return ColumnarCorpus.load(corpus_dir)
+
+
+class ColumnarCorpus(_CorpusBase):
+    """컬럼형 상담 코퍼스
+
+    입력/응답 문자열은 UTF-8 바이트 아레나 + 위치 배열로, 유형과 카테고리는 정수 코드로 저장한다.
+    FAISS 행 번호로 O(1) 조회하며 요청된 행만 dict 로 만든다. 파일에서 읽으면 모든 컬럼이
+    읽기 전용 메모리 매핑이므로 여러 워커 프로세스가 페이지 캐시의 한 벌을 공유한다.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], type_names: List[str], category_names: List[str]):
+        super().__init__(columns['type_codes'], columns['category_codes'], type_names, category_names)
+        self._columns = columns
+
+    @classmethod
+    def from_rows(cls, rows) -> 'ColumnarCorpus':
+        builder = CorpusBuilder()
+        for row in rows:
+            builder.append(row['input'], row['output'], row['type'], row.get('category'), row.get('alternatives'))
+        return builder.build()
+
+    @classmethod
+    def load(cls, corpus_dir: str, mmap: bool = True) -> 'ColumnarCorpus':
+        with open(os.path.join(corpus_dir, CORPUS_META), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        columns = {
+            name: np.load(os.path.join(corpus_dir, f"{name}.npy"), mmap_mode='r' if mmap else None)
+            for name in CORPUS_COLUMNS + ALTERNATIVE_COLUMNS
+            if name in CORPUS_COLUMNS or os.path.exists(os.path.join(corpus_dir, f"{name}.npy"))
+        }
+        corpus = cls(columns, meta['type_names'], meta['category_names'])
+        if len(corpus) != meta['num_rows']:
+            raise ValueError(f"코퍼스 행 수 불일치: {len(corpus)} != {meta['num_rows']}")
+        return corpus
+
+    def save(self, corpus_dir: str):
+        os.makedirs(corpus_dir, exist_ok=True)
+        for name in CORPUS_COLUMNS + (ALTERNATIVE_COLUMNS if self.has_alternatives else ()):
+            np.save(os.path.join(corpus_dir, f"{name}.npy"), np.ascontiguousarray(self._columns[name]))
+        self._write_meta(corpus_dir, 'columnar')
+
+    def _text(self, column: str, index: int) -> str:
+        offsets = self._columns[f"{column}_offsets"]
+        return self._columns[f"{column}_arena"][offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def _texts(self, index: int) -> tuple:
+        return self._text('input', index), self._text('output', index)
+
+    @property
+    def has_alternatives(self) -> bool:
+        return 'alternatives_arena' in self._columns and len(self._columns['alternatives_arena']) > 0
+
+    def _alternatives(self, index: int) -> List[str]:
+        if not self.has_alternatives:
+            return []
+        text = self._text('alternatives', index)
+        return text.split(ALTERNATIVE_SEPARATOR) if text else []
+
+    def nbytes(self) -> int:
+        """컬럼 전체 바이트 수"""
+        return int(sum(column.nbytes for column in self._columns.values()))
+
+
+class BlockCorpus(_CorpusBase):
+    """블록 압축 디스크 코퍼스
+
+    행 텍스트를 block_rows 개씩 묶어 zlib 으로 압축해 한 파일에 이어 붙이고,
+    블록 시작 위치 배열로 FAISS 행 번호 -> 블록을 O(1)로 찾는다. 검색 결과 행이 속한
+    블록만 메모리 매핑에서 읽어 풀고, 최근 사용한 블록은 작은 LRU 에 보관한다.
+    유형/카테고리 코드만 행 단위로 매핑하므로 코퍼스가 RAM 보다 커도 메모리 사용량이 일정하다.
+    """
+
+    def __init__(self, corpus_dir: str, columns: Dict[str, np.ndarray], type_names: List[str],
+                 category_names: List[str], block_rows: int, hot_blocks: int = 64):
+        super().__init__(columns['type_codes'], columns['category_codes'], type_names, category_names)
+        self._block_offsets = columns['block_offsets']
+        self.block_rows = block_rows
+        self._blocks = np.memmap(os.path.join(corpus_dir, BLOCKS_FILE), dtype=np.uint8, mode='r') \
+            if int(self._block_offsets[-1]) else np.zeros(0, dtype=np.uint8)
+        self._hot_blocks = hot_blocks
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def write(corpus: Sequence, corpus_dir: str, block_rows: int = 64, level: int = 6):
+        """코퍼스를 블록 압축 형식으로 저장 (블록 단위로 스트리밍 기록)"""
+        os.makedirs(corpus_dir, exist_ok=True)
+        block_offsets = [0]
+        with open(os.path.join(corpus_dir, BLOCKS_FILE), 'wb') as f:
+            for start in range(0, len(corpus), block_rows):
+                rows = []
+                for index in range(start, min(start + block_rows, len(corpus))):
+                    alternatives = corpus._alternatives(index)
+                    rows.append(list(corpus._texts(index)) + ([alternatives] if alternatives else []))
+                block = zlib.compress(json.dumps(rows, ensure_ascii=False).encode('utf-8'), level)
+                f.write(block)
+                block_offsets.append(block_offsets[-1] + len(block))
+        np.save(os.path.join(corpus_dir, 'block_offsets.npy'), np.asarray(block_offsets, dtype=np.int64))
+        np.save(os.path.join(corpus_dir, 'type_codes.npy'), np.ascontiguousarray(corpus.type_codes))
+        np.save(os.path.join(corpus_dir, 'category_codes.npy'), np.ascontiguousarray(corpus.category_codes))
+        corpus._write_meta(corpus_dir, 'blocks', block_rows=block_rows)
+
+    @classmethod
+    def load(cls, corpus_dir: str, hot_blocks: int = 64) -> 'BlockCorpus':
+        with open(os.path.join(corpus_dir, CORPUS_META), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        columns = {
+            name: np.load(os.path.join(corpus_dir, f"{name}.npy"), mmap_mode='r')
+            for name in BLOCK_COLUMNS
+        }
+        corpus = cls(corpus_dir, columns, meta['type_names'], meta['category_names'], meta['block_rows'], hot_blocks)
+        if len(corpus) != meta['num_rows']:
+            raise ValueError(f"코퍼스 행 수 불일치: {len(corpus)} != {meta['num_rows']}")
+        return corpus
+
+    def _block(self, block_id: int) -> list:
+        with self._cache_lock:
+            rows = self._cache.get(block_id)
+            if rows is not None:
+                self._cache.move_to_end(block_id)
+                return rows
+        start, end = int(self._block_offsets[block_id]), int(self._block_offsets[block_id + 1])
+        rows = json.loads(zlib.decompress(self._blocks[start:end].tobytes()))
+        with self._cache_lock:
+            self._cache[block_id] = rows
+            while len(self._cache) > self._hot_blocks:
+                self._cache.popitem(last=False)
+        return rows
+
+    def _texts(self, index: int) -> tuple:
+        row = self._block(index // self.block_rows)[index % self.block_rows]
+        return row[0], row[1]
+
+    def _alternatives(self, index: int) -> List[str]:
+        row = self._block(index // self.block_rows)[index % self.block_rows]
+        return row[2] if len(row) > 2 else []
+
+    def inputs(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """입력 텍스트만 디코딩 (블록 단위로 순차 읽기, LRU 를 거치지 않음)"""
+        end = len(self) if end is None else end
+        texts = []
+        for block_id in range(start // self.block_rows, (end + self.block_rows - 1) // self.block_rows):
+            offset_start, offset_end = int(self._block_offsets[block_id]), int(self._block_offsets[block_id + 1])
+            rows = json.loads(zlib.decompress(self._blocks[offset_start:offset_end].tobytes()))
+            first = block_id * self.block_rows
+            texts.extend(row[0] for position, row in enumerate(rows) if start <= first + position < end)
+        return texts
+
+    def nbytes(self) -> int:
+        """디스크상의 압축 블록 + 코드 컬럼 바이트 수"""
+        return int(self._blocks.nbytes + self._block_offsets.nbytes + self._type_codes.nbytes
+                   + self._category_codes.nbytes)
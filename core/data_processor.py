@@ -1,13 +1,81 @@
 # core/data_processor.py
 import os
 import json
+import time
 import pandas as pd
 from typing import List, Dict, Union, Optional
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import faiss
 import threading
-from functools import lru_cache
+import shutil
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from core.embedding_cache import EmbeddingCache
+from core.encoder_service import BatchingEncoder
+from core.encoder_backend import load_onnx_encoder, set_cpu_affinity
+from core.parallel_embedding import encode_corpus_parallel
+from core.corpus_store import ColumnarCorpus, CorpusBuilder, BlockCorpus, load_corpus
+from core.lexical_index import BM25Index, reciprocal_rank_fusion
+from core.category_router import CategoryRouter
+from core.dedup import find_duplicate_clusters
+from core.reranker import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+from core.retrieval_cache import RetrievalCache, normalize_query
+from core.index_factory import (
+    INDEX_TYPES, IdFilter, build_index, resolve_params, search_index, read_index_mmap, reconstruct_vectors,
+    mmr_select
+)
+
+# 인코더 추론 백엔드 -> (런타임, 정밀도). 둘 중 하나라도 다르면 벡터가 달라지므로 임베딩 캐시/인덱스를 구분
+ENCODER_BACKENDS = {'torch': ('torch', 'fp32'), 'onnx': ('onnx', 'fp32'), 'onnx-int8': ('onnx', 'int8')}
+
+# 번들 포맷 버전 (파일 구성이 바뀌면 올림)
+BUNDLE_FORMAT_VERSION = 3
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_CORPUS = "corpus"
+BUNDLE_EMBEDDINGS = "embeddings.npy"
+BUNDLE_INDEX = "index.faiss"
+BUNDLE_LEXICAL = "lexical"
+BUNDLE_ROUTER = "router"
+BUNDLE_CURRENT = "CURRENT"
+# 남겨 둘 번들 버전 수 (CURRENT 와 직전 CURRENT 는 이 수와 관계없이 유지)
+BUNDLE_KEEP_VERSIONS = 3
+
+# 인덱스 매니페스트 포맷 버전 (코퍼스 정규화 방식이 바뀌면 올림)
+INDEX_MANIFEST_VERSION = 1
+
+# 하이브리드 검색: 단계별 후보 수와 RRF 상수
+HYBRID_CANDIDATES = 20
+RRF_K = 60
+
+# 필터 조건별 허용 행 집합 캐시 크기
+FILTER_CACHE_SIZE = 64
+
+# 중복 제거 기본값 (텍스트 MinHash 자카드, 임베딩 코사인 임계값)
+DEDUP_DEFAULTS = {'jaccard_threshold': 0.8, 'cosine_threshold': 0.95, 'neighbors': 8}
+# 대표 사례에 보관하는 대체 응답 최대 개수
+MAX_ALTERNATIVES = 5
+
+# MMR 다양성 선택 시 k 대비 후보 배수
+MMR_FETCH_FACTOR = 4
+# MMR 전에 중복으로 보고 빼는 후보 간 임베딩 코사인 유사도 하한
+NEAR_DUPLICATE_COSINE = 0.98
+
+# 쿼리 임베딩 메모리 캐시 크기
+QUERY_CACHE_SIZE = 4096
+
+
+def file_sha256(file_path: str) -> Optional[str]:
+    """파일 내용 해시 (파일이 없으면 None)"""
+    if not os.path.exists(file_path):
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 
 class DataProcessor:
     _instance = None
@@ -20,36 +88,94 @@ class DataProcessor:
                     cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, model_name: str = "jhgan/ko-sbert-nli"):
+    def __init__(self, model_name: str = "jhgan/ko-sbert-nli", cache_dir: Optional[str] = "data/embedding_cache",
+                 backend: str = "torch", num_threads: Optional[int] = None, cpu_affinity: Optional[List[int]] = None):
         if not hasattr(self, 'initialized'):
-            self.model = SentenceTransformer(model_name, device='cpu')
+            self.model_name = model_name
+            set_cpu_affinity(cpu_affinity)
+            self.backend, self.model = self._load_encoder(model_name, backend, num_threads)
+            # 텍스트 해시 기반 디스크 임베딩 캐시 (코퍼스 재빌드/워커 프로세스 공유, 쿼리는 읽기만 함)
+            self.embedding_cache = None
+            if cache_dir:
+                try:
+                    self.embedding_cache = EmbeddingCache(
+                        cache_dir, model_name, self.model.get_sentence_embedding_dimension(), self.encoder_id
+                    )
+                except Exception as e:
+                    print(f"임베딩 캐시 초기화 중 오류: {str(e)}")
+            self.encoder_service = None
+            # 쿼리 임베딩 메모리 LRU 캐시 (텍스트 -> 벡터)
+            self._query_vectors = OrderedDict()
+            # 교차 인코더 재정렬 (enable_reranking 으로 활성화)
+            self.reranker = None
+            self.rerank_candidates = 10
+            # 정규화 쿼리 검색 결과 캐시 (enable_retrieval_cache 로 활성화)
+            self.retrieval_cache = None
+            # 인덱스/코퍼스/검색 설정이 바뀔 때마다 올려 검색 결과 캐시를 무효화
+            self.index_version = 0
             self.index = None
-            self.counseling_data = []
+            self.index_type = 'flat'
+            self.index_params = {}
+            self.embeddings = None
+            self.lexical_index = None
+            # 웰니스 카테고리 라우팅 (route_categories 개 카테고리만 검색, None 이면 사용 안 함)
+            self.category_router = None
+            self.route_categories = None
+            self._filter_cache = (None, {})
+            self.bundle_manifest = None
+            self.counseling_data = ColumnarCorpus.from_rows([])
+            self.sources = []
+            # 중복 제거 설정(configure_dedup)과 마지막 결과 통계
+            self.dedup_settings = None
+            self.dedup_stats = None
             self.wellness_data = []
             self.batch_size = 32
             self.initialized = True
     
+    @property
+    def encoder_id(self) -> str:
+        """인코더 런타임/정밀도 식별자 (예: torch-fp32, onnx-int8)"""
+        return "-".join(ENCODER_BACKENDS[self.backend])
+
+    @staticmethod
+    def _load_encoder(model_name: str, backend: str, num_threads: Optional[int]) -> tuple:
+        """인코더 백엔드 로드, 실패 시 torch 로 대체"""
+        if backend not in ENCODER_BACKENDS:
+            print(f"지원하지 않는 인코더 백엔드: {backend} (가능: {', '.join(ENCODER_BACKENDS)})")
+            backend = 'torch'
+        if backend != 'torch':
+            try:
+                return backend, load_onnx_encoder(
+                    model_name, quantized=(backend == 'onnx-int8'), num_threads=num_threads
+                )
+            except Exception as e:
+                print(f"ONNX 인코더 로드 실패, torch 백엔드 사용: {str(e)}")
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+        return 'torch', SentenceTransformer(model_name, device='cpu')
+
     def load_counseling_data(self, single_turn_path: str, multi_turn_path: str, wellness_path: str) -> bool:
         """모든 상담 데이터 로드"""
         try:
-            # 기존 데이터 초기화
-            self.counseling_data = []
+            # 행마다 dict 를 만들지 않고 컬럼형 코퍼스로 바로 적재
+            corpus = CorpusBuilder()
+            self.sources = []
             
             # 싱글턴 데이터 로드
+            start = len(corpus)
             if os.path.exists(single_turn_path):
                 with open(single_turn_path, 'r', encoding='utf-8') as f:
                     for line in f:
                         try:
                             data = json.loads(line.strip())
-                            self.counseling_data.append({
-                                'input': data['input'],
-                                'output': data['output'],
-                                'type': 'single'
-                            })
-                        except json.JSONDecodeError:
+                            corpus.append(data['input'], data['output'], 'single')
+                        except (json.JSONDecodeError, KeyError):
                             continue
+            self._register_source('single', single_turn_path, start, len(corpus))
             
             # 멀티턴 데이터 로드
+            start = len(corpus)
             if os.path.exists(multi_turn_path):
                 with open(multi_turn_path, 'r', encoding='utf-8') as f:
                     for line in f:
@@ -57,54 +183,262 @@ class DataProcessor:
                             data = json.loads(line.strip())
                             processed_dialog = self._process_multiturn_dialog(data)
                             if processed_dialog:
-                                self.counseling_data.append(processed_dialog)
+                                corpus.append(**processed_dialog)
                         except json.JSONDecodeError:
                             continue
+            self._register_source('multi', multi_turn_path, start, len(corpus))
 
-            # Wellness 데이터셋 로드
+            # Wellness 데이터셋 로드 (iterrows 대신 컬럼 단위 처리)
+            start = len(corpus)
             if os.path.exists(wellness_path):
                 try:
-                    wellness_df = pd.read_csv(wellness_path)
-                    for _, row in wellness_df.iterrows():
-                        self.counseling_data.append({
-                            'input': row['Q'],
-                            'output': row['A'],
-                            'type': 'wellness'
-                        })
+                    wellness_df = pd.read_csv(wellness_path, encoding='utf-8-sig')
+                    if '유저' in wellness_df.columns and '챗봇' in wellness_df.columns:
+                        wellness_df = wellness_df.dropna(subset=['유저', '챗봇'])
+                        categories = wellness_df['구분'].fillna('') if '구분' in wellness_df.columns else [''] * len(wellness_df)
+                        for user_text, bot_text, category in zip(wellness_df['유저'], wellness_df['챗봇'], categories):
+                            corpus.append(str(user_text).strip(), str(bot_text).strip(), 'wellness', str(category))
+                    else:
+                        print("CSV 파일의 필수 컬럼(유저, 챗봇)이 없습니다.")
                 except Exception as e:
                     print(f"Wellness 데이터 로드 중 오류: {str(e)}")
+            self._register_source('wellness', wellness_path, start, len(corpus))
             
+            self.counseling_data = corpus.build()
+            self.dedup_stats = None
             return len(self.counseling_data) > 0
             
         except Exception as e:
             print(f"데이터 로드 중 오류 발생: {str(e)}")
             return False
     
-    def _process_multiturn_dialog(self, dialog_data: Dict) -> Optional[Dict]:
+    def _register_source(self, name: str, file_path: str, start: int, end: int):
+        """원본 파일 해시와 코퍼스 내 행 범위 기록"""
+        self.sources.append({
+            'name': name,
+            'path': file_path,
+            'sha256': file_sha256(file_path),
+            'start': start,
+            'count': end - start
+        })
+
+    def _process_multiturn_dialog(self, dialog_data: Union[Dict, List]) -> Optional[Dict]:
         """멀티턴 대화 데이터 처리"""
         try:
             processed_input = ""
             processed_output = ""
             
-            for utterance in dialog_data.get('dialogue', []):
-                if utterance.get('speaker') == 'user':
-                    processed_input += f"내담자: {utterance.get('utterance', '')}\n"
-                else:
-                    processed_output += f"상담사: {utterance.get('utterance', '')}\n"
+            # 발화 리스트 형식: 같은 화자의 연속 발화는 하나로 합침
+            if isinstance(dialog_data, list):
+                current_speaker = None
+                current_utterance = ""
+                
+                for turn in dialog_data:
+                    speaker = turn.get('speaker', '')
+                    utterance = turn.get('utterance', '')
+                    
+                    if current_speaker and current_speaker != speaker:
+                        if current_speaker == "내담자":
+                            processed_input += f"{current_utterance.strip()}\n"
+                        else:
+                            processed_output += f"{current_utterance.strip()}\n"
+                        current_utterance = utterance
+                    else:
+                        current_utterance += f" {utterance}"
+                    
+                    current_speaker = speaker
+                
+                if current_speaker == "내담자":
+                    processed_input += f"{current_utterance.strip()}\n"
+                elif current_speaker:
+                    processed_output += f"{current_utterance.strip()}\n"
+            else:
+                for utterance in dialog_data.get('dialogue', []):
+                    if utterance.get('speaker') == 'user':
+                        processed_input += f"내담자: {utterance.get('utterance', '')}\n"
+                    else:
+                        processed_output += f"상담사: {utterance.get('utterance', '')}\n"
             
             return {
                 'input': processed_input.strip(),
                 'output': processed_output.strip(),
                 'type': 'multi'
-            } if processed_input and processed_output else None
+            } if processed_input.strip() and processed_output.strip() else None
             
         except Exception:
             return None
 
-    @lru_cache(maxsize=1024)
+    def get_type_counts(self) -> Dict[str, int]:
+        """데이터 유형별 개수"""
+        return self.counseling_data.type_counts()
+
     def encode_text(self, text: str) -> np.ndarray:
-        """텍스트 인코딩 (캐시 사용)"""
-        return self.model.encode(text, convert_to_numpy=True, show_progress_bar=False)
+        """쿼리 텍스트 인코딩 (메모리 LRU 캐시 사용)"""
+        return self._encode_queries([text])[0]
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """쿼리 목록 인코딩
+
+        메모리 LRU(QUERY_CACHE_SIZE) → 코퍼스 디스크 캐시(읽기 전용) → 모델 순으로 찾는다.
+        사용자 메시지는 디스크 캐시에 기록하지 않는다 (대화 내용이 파일로 남거나 캐시가 끝없이 커지지 않도록).
+        """
+        vectors = self._cached_query_vectors(queries)
+        missing = [position for position, vector in enumerate(vectors) if vector is None]
+        if missing:
+            texts = list(dict.fromkeys(queries[position] for position in missing))
+            if self.embedding_cache is not None:
+                found, uncached = self.embedding_cache.lookup(texts)
+            else:
+                dimension = self.model.get_sentence_embedding_dimension()
+                found, uncached = np.zeros((len(texts), dimension), dtype=np.float32), list(range(len(texts)))
+            if len(uncached) == 1 and self.encoder_service is not None:
+                # 동시 세션의 쿼리를 모아 한 번에 인코딩
+                found[uncached[0]] = self.encoder_service.encode(texts[uncached[0]])
+            elif uncached:
+                found[uncached] = self._encode_batches([texts[row] for row in uncached])
+            self._remember_query_vectors(texts, found)
+            positions = {text: row for row, text in enumerate(texts)}
+            for position in missing:
+                vectors[position] = found[positions[queries[position]]]
+        return np.vstack(vectors)
+
+    def _cached_query_vectors(self, queries: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock:
+            vectors = []
+            for query in queries:
+                vector = self._query_vectors.get(query)
+                if vector is not None:
+                    self._query_vectors.move_to_end(query)
+                vectors.append(vector)
+            return vectors
+
+    def _remember_query_vectors(self, queries: List[str], vectors: np.ndarray):
+        with self._lock:
+            for query, vector in zip(queries, vectors):
+                self._query_vectors[query] = vector
+                self._query_vectors.move_to_end(query)
+            while len(self._query_vectors) > QUERY_CACHE_SIZE:
+                self._query_vectors.popitem(last=False)
+    
+    def enable_batching(self, max_wait_ms: float = 5.0, max_batch_size: int = 32) -> BatchingEncoder:
+        """쿼리 인코딩 마이크로 배치 워커 활성화 (프로세스당 하나)"""
+        with self._lock:
+            if self.encoder_service is None:
+                self.encoder_service = BatchingEncoder(self._encode_batches, max_batch_size, max_wait_ms)
+        return self.encoder_service
+
+    def enable_reranking(self, model_name: str = DEFAULT_RERANKER_MODEL, candidates: int = 10,
+                         budget_ms: float = 150.0) -> bool:
+        """교차 인코더 재정렬 활성화 (상위 candidates 개 후보를 budget_ms 안에서 재정렬)"""
+        try:
+            with self._lock:
+                if self.reranker is None:
+                    self.reranker = CrossEncoderReranker(model_name, budget_ms=budget_ms)
+            self.rerank_candidates = candidates
+            self.index_version += 1
+            return True
+        except Exception as e:
+            print(f"재정렬 모델 로드 중 오류: {str(e)}")
+            self.reranker = None
+            return False
+
+    def enable_retrieval_cache(self, max_entries: int = 1024, ttl_seconds: float = 600.0) -> RetrievalCache:
+        """find_similar_cases 결과 캐시 활성화 (정규화 쿼리 + 검색 옵션 단위, LRU + TTL)"""
+        with self._lock:
+            if self.retrieval_cache is None:
+                self.retrieval_cache = RetrievalCache(max_entries, ttl_seconds)
+        return self.retrieval_cache
+
+    def get_retrieval_cache_stats(self) -> Dict:
+        """검색 결과 캐시 적중/실패 통계 (캐시가 꺼져 있으면 빈 딕셔너리)"""
+        if self.retrieval_cache is None:
+            return {}
+        return self.retrieval_cache.get_stats()
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        """텍스트 목록 인코딩 (캐시에 없는 텍스트만 모델로 인코딩)"""
+        if self.embedding_cache is None or not texts:
+            return self._encode_batches(texts)
+
+        embeddings, missing = self.embedding_cache.lookup(texts)
+        if missing:
+            # 중복 텍스트는 한 번만 인코딩
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = self._encode_batches(unique_texts)
+            self.embedding_cache.put_many(unique_texts, encoded)
+            positions = {text: row for row, text in enumerate(unique_texts)}
+            embeddings[missing] = encoded[[positions[texts[i]] for i in missing]]
+        return embeddings
+
+    def _encode_batches(self, texts: List[str]) -> np.ndarray:
+        """텍스트 목록을 배치 단위로 모델 인코딩"""
+        embeddings_list = []
+        for i in range(0, len(texts), self.batch_size):
+            batch_texts = texts[i:i + self.batch_size]
+            batch_embeddings = self.model.encode(
+                batch_texts, 
+                convert_to_numpy=True,
+                show_progress_bar=False,
+                batch_size=self.batch_size
+            )
+            embeddings_list.append(batch_embeddings)
+        if not embeddings_list:
+            dimension = self.model.get_sentence_embedding_dimension()
+            return np.zeros((0, dimension), dtype=np.float32)
+        return np.vstack(embeddings_list).astype(np.float32)
+
+    def configure_index(self, index_type: str = 'flat', **params) -> bool:
+        """인덱스 유형(flat, ivf_flat, ivf_pq, hnsw)과 파라미터 설정
+
+        예: configure_index('ivf_flat', nlist=256, nprobe=16), configure_index('hnsw', M=32, ef_search=64)
+        """
+        if index_type not in INDEX_TYPES:
+            print(f"지원하지 않는 인덱스 유형: {index_type} (가능: {', '.join(INDEX_TYPES)})")
+            return False
+        self.index_type = index_type
+        self.index_params = {key: value for key, value in params.items() if value is not None}
+        return True
+
+    def _build_index(self, embeddings: np.ndarray):
+        """임베딩으로 FAISS 인덱스 생성 (설정된 인덱스 유형 사용)"""
+        self.embeddings = embeddings
+        try:
+            self.index = build_index(embeddings, self.index_type, self.index_params)
+        except Exception as e:
+            # 코퍼스가 너무 작아 학습이 불가능한 경우 등은 flat으로 대체
+            print(f"{self.index_type} 인덱스 생성 실패, flat 인덱스 사용: {str(e)}")
+            self.index_type = 'flat'
+            self.index_params = {}
+            self.index = build_index(embeddings, 'flat')
+        self._build_lexical_index()
+        self._build_category_router()
+        self.index_version += 1
+
+    def _build_category_router(self):
+        """웰니스 카테고리별 중심 임베딩 계산 (카테고리가 없으면 None)"""
+        try:
+            category_codes = self.counseling_data.category_codes
+            has_categories = len(category_codes) and int(category_codes.max()) >= 0
+            self.category_router = CategoryRouter.build(self.embeddings, category_codes) if has_categories else None
+        except Exception as e:
+            print(f"카테고리 라우터 생성 중 오류: {str(e)}")
+            self.category_router = None
+
+    def configure_routing(self, route_categories: Optional[int]):
+        """밀집 검색에서 웰니스 행을 쿼리와 가까운 카테고리 route_categories 개로 제한 (None 이면 전체 검색)
+
+        유형 조건이 없거나 웰니스를 포함하고 카테고리를 지정하지 않은 검색(하이브리드 포함)에 적용된다.
+        """
+        self.route_categories = route_categories or None
+        self.index_version += 1
+
+    def _build_lexical_index(self):
+        """코퍼스 입력 텍스트로 문자 n-gram BM25 색인 생성 (실패 시 밀집 검색만 사용)"""
+        try:
+            self.lexical_index = BM25Index.build(self.counseling_data.inputs())
+        except Exception as e:
+            print(f"어휘 색인 생성 중 오류: {str(e)}")
+            self.lexical_index = None
     
     def create_embeddings(self) -> bool:
         """문서 임베딩 생성"""
@@ -112,26 +446,10 @@ class DataProcessor:
             if not self.counseling_data:
                 return False
                 
-            texts = [data['input'] for data in self.counseling_data]
-            embeddings_list = []
-            
-            # 배치 처리로 임베딩 생성
-            for i in range(0, len(texts), self.batch_size):
-                batch_texts = texts[i:i + self.batch_size]
-                batch_embeddings = self.model.encode(
-                    batch_texts, 
-                    convert_to_numpy=True,
-                    show_progress_bar=False,
-                    batch_size=self.batch_size
-                )
-                embeddings_list.append(batch_embeddings)
-            
-            embeddings = np.vstack(embeddings_list)
+            texts = self.counseling_data.inputs()
             
-            # FAISS 인덱스 생성
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(embeddings)
+            # 배치 처리로 임베딩 생성 후 FAISS 인덱스 생성
+            self._build_index(self._encode_texts(texts))
             
             return True
             
@@ -139,40 +457,714 @@ class DataProcessor:
             print(f"임베딩 생성 중 오류: {str(e)}")
             return False
 
-    def find_similar_cases(self, query: str, k: int = 3) -> List[Dict]:
-        """유사 케이스 검색"""
+    def create_embeddings_parallel(self, checkpoint_dir: str, num_workers: Optional[int] = None,
+                                   shard_size: int = 2048) -> bool:
+        """프로세스 풀 기반 문서 임베딩 생성 (샤드 체크포인트로 중단 후 재개 가능)"""
+        try:
+            if not self.counseling_data:
+                return False
+
+            texts = self.counseling_data.inputs()
+            embeddings = encode_corpus_parallel(
+                texts, checkpoint_dir, self.model_name, self.backend,
+                self.model.get_sentence_embedding_dimension(), num_workers, shard_size,
+                self.batch_size, self.embedding_cache
+            )
+            self._build_index(embeddings)
+            return True
+
+        except Exception as e:
+            print(f"병렬 임베딩 생성 중 오류: {str(e)}")
+            return False
+
+    def update_embeddings(self, manifest: Dict, previous_embeddings: np.ndarray) -> Optional[List[str]]:
+        """이전 매니페스트와 비교해 변경된 소스만 다시 임베딩
+
+        해시와 행 수가 같은 소스는 이전 임베딩을 재사용한다.
+        성공 시 다시 임베딩한 소스 이름 목록을 반환한다.
+        """
+        try:
+            if not self.counseling_data:
+                return None
+            # 중복 제거된 이전 임베딩은 원본 행 범위로 나눌 수 없으므로 전체 재생성 (임베딩 캐시로 재사용)
+            if (manifest.get('manifest_version') != INDEX_MANIFEST_VERSION
+                    or manifest.get('model_name') != self.model_name
+                    or manifest.get('encoder', 'torch-fp32') != self.encoder_id
+                    or manifest.get('dedup')
+                    or previous_embeddings.shape[0] != manifest.get('num_rows')):
+                return [source['name'] for source in self.sources] if self.create_embeddings() else None
+
+            previous_sources = {source['name']: source for source in manifest.get('sources', [])}
+            parts = []
+            reembedded = []
+            for source in self.sources:
+                previous = previous_sources.get(source['name'])
+                if (previous and previous['sha256'] == source['sha256']
+                        and previous['count'] == source['count']):
+                    parts.append(np.asarray(
+                        previous_embeddings[previous['start']:previous['start'] + previous['count']],
+                        dtype=np.float32
+                    ))
+                else:
+                    parts.append(self._encode_texts(
+                        self.counseling_data.inputs(source['start'], source['start'] + source['count'])
+                    ))
+                    reembedded.append(source['name'])
+
+            self._build_index(np.vstack(parts))
+            return reembedded
+
+        except Exception as e:
+            print(f"임베딩 갱신 중 오류: {str(e)}")
+            return None
+
+    def configure_dedup(self, jaccard_threshold: float = DEDUP_DEFAULTS['jaccard_threshold'],
+                        cosine_threshold: float = DEDUP_DEFAULTS['cosine_threshold'],
+                        neighbors: int = DEDUP_DEFAULTS['neighbors']):
+        """중복 제거 설정 (임베딩 생성 후 deduplicate 호출 시 사용)"""
+        self.dedup_settings = {
+            'jaccard_threshold': jaccard_threshold,
+            'cosine_threshold': cosine_threshold,
+            'neighbors': neighbors
+        }
+
+    def deduplicate(self) -> Optional[Dict]:
+        """유사 중복 사례를 하나의 대표 사례로 합치고 인덱스 재생성
+
+        입력 텍스트 MinHash LSH(자카드)와 임베딩 최근접 이웃(코사인)으로 클러스터를 찾는다.
+        클러스터에서 가장 앞선 행을 대표로 남기고, 다른 행의 서로 다른 응답은 대표의
+        'alternatives' 로 보관한다. 성공 시 중복 제거 통계를 반환한다.
+        """
+        try:
+            if self.embeddings is None or self.index is None or not self.counseling_data:
+                print("중복 제거 실패: 코퍼스 또는 임베딩이 없습니다.")
+                return None
+            settings = self.dedup_settings or dict(DEDUP_DEFAULTS)
+            corpus = self.counseling_data
+            clusters = find_duplicate_clusters(
+                corpus.inputs(), self.embeddings, lambda queries, k: self._search_vectors(queries, k), **settings
+            )
+            labels = clusters['labels']
+            representatives = np.flatnonzero(labels == np.arange(len(labels)))
+            members = {}
+            for row, label in enumerate(labels):
+                members.setdefault(int(label), []).append(row)
+
+            builder = CorpusBuilder()
+            for representative in representatives:
+                case = corpus[representative]
+                alternatives = list(case.get('alternatives', []))
+                for member in members[int(representative)][1:]:
+                    member_case = corpus[member]
+                    for output in [member_case['output']] + member_case.get('alternatives', []):
+                        if output != case['output'] and output not in alternatives:
+                            alternatives.append(output)
+                builder.append(case['input'], case['output'], case['type'], case.get('category'),
+                               alternatives[:MAX_ALTERNATIVES])
+
+            embeddings = np.asarray(self.embeddings[representatives], dtype=np.float32)
+            self.counseling_data = builder.build()
+            self._build_index(embeddings)
+            self.dedup_stats = dict(
+                settings,
+                raw_rows=len(labels),
+                num_rows=len(representatives),
+                text_merges=clusters['text_merges'],
+                embedding_merges=clusters['embedding_merges']
+            )
+            print(f"중복 제거: {len(labels)}행 -> {len(representatives)}행 "
+                  f"(텍스트 {clusters['text_merges']}건, 임베딩 {clusters['embedding_merges']}건 병합)")
+            return self.dedup_stats
+
+        except Exception as e:
+            print(f"중복 제거 중 오류: {str(e)}")
+            return None
+
+    def build_manifest(self) -> Dict:
+        """현재 코퍼스/인덱스 상태의 매니페스트
+
+        중복 제거 후에는 sources 의 행 범위가 중복 제거 전 코퍼스 기준이며 'dedup' 에 통계를 기록한다.
+        """
+        manifest = {
+            'manifest_version': INDEX_MANIFEST_VERSION,
+            'model_name': self.model_name,
+            'encoder': self.encoder_id,
+            'dimension': int(self.index.d),
+            'num_rows': len(self.counseling_data),
+            'index_type': self.index_type,
+            'index_params': resolve_params(self.index_type, len(self.counseling_data), self.index_params),
+            'sources': [
+                {key: source[key] for key in ('name', 'sha256', 'start', 'count')}
+                for source in self.sources
+            ]
+        }
+        if self.dedup_stats:
+            manifest['dedup'] = self.dedup_stats
+        return manifest
+
+    def check_manifest(self, manifest: Dict) -> List[str]:
+        """매니페스트와 현재 코퍼스 비교, 불일치 사유 목록 반환 (빈 목록이면 최신)"""
+        problems = []
+        if manifest.get('manifest_version') != INDEX_MANIFEST_VERSION:
+            problems.append("매니페스트 버전 불일치")
+        if manifest.get('model_name') != self.model_name:
+            problems.append(f"모델 불일치: {manifest.get('model_name')}")
+        if manifest.get('encoder', 'torch-fp32') != self.encoder_id:
+            problems.append(f"인코더 불일치: {manifest.get('encoder', 'torch-fp32')} != {self.encoder_id}")
+        dedup = manifest.get('dedup')
+        raw_rows = dedup['raw_rows'] if dedup else manifest.get('num_rows')
+        if raw_rows != len(self.counseling_data):
+            problems.append(f"행 수 불일치: {raw_rows} != {len(self.counseling_data)}")
+        if {key: value for key, value in (dedup or {}).items() if key in DEDUP_DEFAULTS} != (self.dedup_settings or {}):
+            problems.append("중복 제거 설정 변경")
+        num_rows = manifest.get('num_rows', len(self.counseling_data))
+        if (manifest.get('index_type', 'flat') != self.index_type
+                or manifest.get('index_params', {}) != resolve_params(self.index_type, num_rows, self.index_params)):
+            problems.append(f"인덱스 설정 변경: {manifest.get('index_type', 'flat')} -> {self.index_type}")
+        if self.sources:
+            current = {source['name']: source['sha256'] for source in self.sources}
+            previous = {source['name']: source['sha256'] for source in manifest.get('sources', [])}
+            for name in current:
+                if current[name] != previous.get(name):
+                    problems.append(f"원본 변경: {name}")
+        return problems
+
+    def find_similar_cases(self, query: str, k: int = 3, nprobe: Optional[int] = None,
+                           ef_search: Optional[int] = None, rerank_factor: Optional[int] = None,
+                           hybrid: bool = False, types: Optional[List[str]] = None,
+                           categories: Optional[List[str]] = None, rerank: bool = False,
+                           diversity: Optional[float] = None) -> List[Dict]:
+        """유사 케이스 검색
+
+        IVF는 nprobe, HNSW는 ef_search로 쿼리별 정확도/속도를 조절한다.
+        압축 인덱스는 rerank_factor(기본: 인덱스 설정값)만큼 후보를 더 뽑아 float32 임베딩으로 재정렬한다.
+        hybrid=True 이면 밀집 검색과 BM25 결과를 합친 순위를 사용한다 (어휘 색인이 없으면 밀집 검색).
+        types(single/multi/wellness), categories(웰니스 구분)를 주면 조건에 맞는 사례만 검색한다.
+        라우팅이 켜져 있으면(configure_routing) 밀집 검색에서 웰니스 행은 가까운 카테고리의 행만 검색한다.
+        rerank=True 이고 재정렬이 활성화되어 있으면 상위 rerank_candidates 개 후보를 교차 인코더로
+        다시 정렬한다 (시간 예산을 넘기면 검색 순서 유지).
+        diversity(MMR lambda, 0~1)를 주면 k * MMR_FETCH_FACTOR 개 후보에서 입력/응답이 같거나 임베딩이
+        거의 같은(NEAR_DUPLICATE_COSINE 이상) 후보를 빼고 서로 겹치지 않는 k개를 고른다. 1에 가까울수록 관련성, 0에 가까울수록 다양성을 우선한다.
+        검색 결과 캐시가 켜져 있으면(enable_retrieval_cache) 정규화한 쿼리와 검색 옵션이 같은 요청은
+        인코딩/검색 없이 캐시된 사례 번호를 사용한다.
+        """
         if not self.counseling_data or not self.index:
             return []
+
+        cache_key = None
+        # 검색 중 인덱스가 바뀌어도 이전 인덱스의 결과가 새 버전으로 저장되지 않도록 버전을 한 번만 읽음
+        version = self.index_version
+        if self.retrieval_cache is not None:
+            cache_key = (normalize_query(query), k, nprobe, ef_search, rerank_factor, hybrid,
+                         tuple(sorted(types or ())), tuple(sorted(categories or ())), rerank, diversity)
+            case_ids = self.retrieval_cache.get(cache_key, version)
+            if case_ids is not None:
+                return [self.counseling_data[idx] for idx in case_ids]
+
+        case_ids, complete = self._find_case_ids(query, k, nprobe, ef_search, rerank_factor, hybrid,
+                                                 types, categories, rerank, diversity)
+        # 재정렬이 시간 예산 등으로 생략된 결과나 빈 결과(검색 오류 포함)는 캐시하지 않음
+        if cache_key is not None and complete and case_ids:
+            self.retrieval_cache.put(cache_key, tuple(case_ids), version)
+        return [self.counseling_data[idx] for idx in case_ids]
+
+    def _find_case_ids(self, query: str, k: int, nprobe: Optional[int], ef_search: Optional[int],
+                       rerank_factor: Optional[int], hybrid: bool, types: Optional[List[str]],
+                       categories: Optional[List[str]], rerank: bool, diversity: Optional[float]) -> tuple:
+        """find_similar_cases 의 검색/재정렬/다양성 단계, (사례 번호 목록, 재정렬 완료 여부) 반환"""
+        complete = True
+        use_reranker = rerank and self.reranker is not None
+        pool_size = k * MMR_FETCH_FACTOR if diversity is not None else k
+        search_k = max(pool_size, self.rerank_candidates) if use_reranker else pool_size
+        case_ids = self._search_case_ids(query, search_k, nprobe, ef_search, rerank_factor, hybrid, types, categories)
+        relevance = None
+        if use_reranker and len(case_ids) > 1:
+            try:
+                case_ids, info = self.reranker.rerank(
+                    query, [(idx, self.counseling_data[idx]['input']) for idx in case_ids], pool_size,
+                    self.counseling_data
+                )
+                relevance = info.get('scores')
+                complete = info['reranked']
+            except Exception as e:
+                print(f"재정렬 중 오류: {str(e)}")
+                complete = False
+        if diversity is not None and len(case_ids) > 1:
+            # 관련성은 교차 인코더 점수, 없으면 쿼리와의 코사인 유사도 (하이브리드의 BM25 신호는 후보 풀에 반영됨).
+            # 순위 위치를 관련성으로 쓰면 순위 간격이 중복 감점보다 커서 MMR 이 거의 재정렬하지 않는다
+            case_ids = case_ids[:pool_size]
+            case_ids = self._diverse_case_ids(query, case_ids, k, diversity, relevance)
+        return case_ids[:k], complete
+
+    def _diverse_case_ids(self, query: str, case_ids: List[int], k: int, diversity: float,
+                          relevance: Optional[List[float]] = None) -> List[int]:
+        """후보 벡터를 복원해 중복 후보를 빼고 MMR 로 다양한 k개 선택 (실패 시 앞에서부터 k개)
+
+        관련성 점수(교차 인코더 점수)가 있으면 0~1로 정규화해 쓰고, 없으면 쿼리와의 코사인 유사도를 쓴다.
+        """
+        try:
+            vectors = reconstruct_vectors(self.index, np.asarray(case_ids), self.embeddings)
+            positions = self._distinct_positions(case_ids, vectors)
+            case_ids = [case_ids[position] for position in positions]
+            vectors = vectors[positions]
+            if relevance is not None:
+                relevance = np.asarray(relevance, dtype=np.float32)[positions]
+                spread = float(relevance.max() - relevance.min())
+                relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+            selected = mmr_select(self.encode_text(query), vectors, k, diversity, relevance)
+            return [case_ids[position] for position in selected]
+        except Exception as e:
+            print(f"다양성 선택 중 오류: {str(e)}")
+            return case_ids[:k]
+
+    def _distinct_positions(self, case_ids: List[int], vectors: np.ndarray) -> List[int]:
+        """앞선 후보와 입력/응답이 같거나 임베딩 코사인 유사도가 NEAR_DUPLICATE_COSINE 이상인 후보를 뺀 위치 목록"""
+        normalized = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        seen = set()
+        kept = []
+        for position, idx in enumerate(case_ids):
+            case = self.counseling_data[idx]
+            text = ((case.get('input') or '').strip(), (case.get('output') or '').strip())
+            if text in seen:
+                continue
+            if kept and float(np.max(normalized[kept] @ normalized[position])) >= NEAR_DUPLICATE_COSINE:
+                continue
+            seen.add(text)
+            kept.append(position)
+        return kept
+
+    def _search_case_ids(self, query: str, k: int, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                         rerank_factor: Optional[int] = None, hybrid: bool = False,
+                         types: Optional[List[str]] = None, categories: Optional[List[str]] = None) -> List[int]:
+        """검색 결과 사례 번호 목록 (find_similar_cases 의 검색 단계)"""
+        if hybrid and self.lexical_index is not None:
+            return self.hybrid_search(query, k, nprobe=nprobe, ef_search=ef_search, rerank_factor=rerank_factor,
+                                      types=types, categories=categories)['ids']
             
         try:
+            id_filter = self._id_filter(types, categories)
+            if id_filter is not None and not len(id_filter):
+                return []
             query_vector = self.encode_text(query).reshape(1, -1)
-            distances, indices = self.index.search(query_vector, k)
+            distances, indices = self._dense_search(
+                query_vector, k, nprobe, ef_search, rerank_factor, types, categories, id_filter
+            )
             
-            similar_cases = []
-            for idx in indices[0]:
-                if 0 <= idx < len(self.counseling_data):
-                    similar_cases.append(self.counseling_data[idx])
-                
-            return similar_cases
+            return [int(idx) for idx in indices[0] if 0 <= idx < len(self.counseling_data)]
             
         except Exception as e:
             print(f"유사 케이스 검색 중 오류: {str(e)}")
             return []
 
+    def hybrid_search(self, query: str, k: int = 3, candidates: int = HYBRID_CANDIDATES,
+                      dense_weight: float = 1.0, lexical_weight: float = 1.0, nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None, rerank_factor: Optional[int] = None,
+                      types: Optional[List[str]] = None, categories: Optional[List[str]] = None) -> Dict:
+        """밀집 + BM25 하이브리드 검색
+
+        두 검색에서 각각 candidates 개 후보를 뽑아 가중 RRF 로 합친다.
+        {'cases': 케이스 목록, 'ids': 사례 번호 목록, 'timings': 단계별 지연 시간(ms)} 을 반환한다.
+        """
+        timings = {}
+        try:
+            start = time.perf_counter()
+            id_filter = self._id_filter(types, categories)
+            if id_filter is not None and not len(id_filter):
+                return {'cases': [], 'ids': [], 'timings': timings}
+            query_vector = self.encode_text(query).reshape(1, -1)
+            timings['encode_ms'] = (time.perf_counter() - start) * 1000
+
+            stage = time.perf_counter()
+            fetch_k = min(max(k, candidates), self.index.ntotal)
+            _, dense_ids = self._dense_search(
+                query_vector, fetch_k, nprobe, ef_search, rerank_factor, types, categories, id_filter
+            )
+            timings['dense_ms'] = (time.perf_counter() - stage) * 1000
+
+            stage = time.perf_counter()
+            lexical_ids = np.zeros(0, dtype=np.int64)
+            if self.lexical_index is not None:
+                _, lexical_ids = self.lexical_index.search(
+                    query, fetch_k, id_filter.mask if id_filter is not None else None
+                )
+            timings['lexical_ms'] = (time.perf_counter() - stage) * 1000
+
+            stage = time.perf_counter()
+            ids = [
+                idx for idx in reciprocal_rank_fusion([dense_ids[0], lexical_ids], k, RRF_K,
+                                                      [dense_weight, lexical_weight])
+                if 0 <= idx < len(self.counseling_data)
+            ]
+            cases = [self.counseling_data[idx] for idx in ids]
+            timings['fusion_ms'] = (time.perf_counter() - stage) * 1000
+            timings['total_ms'] = (time.perf_counter() - start) * 1000
+            return {'cases': cases, 'ids': ids, 'timings': timings}
+
+        except Exception as e:
+            print(f"하이브리드 검색 중 오류: {str(e)}")
+            return {'cases': [], 'ids': [], 'timings': timings}
+
+    def find_similar_cases_batch(self, queries: List[str], k: int = 3, nprobe: Optional[int] = None,
+                                 ef_search: Optional[int] = None,
+                                 rerank_factor: Optional[int] = None, types: Optional[List[str]] = None,
+                                 categories: Optional[List[str]] = None) -> List[List[Dict]]:
+        """여러 쿼리 일괄 검색
+
+        쿼리를 한 번의 배치로 인코딩하고 쿼리 행렬 전체를 한 번에 검색한다.
+        쿼리별로 케이스 사본에 'id'(FAISS 행 번호)와 'distance'를 더한 목록을 반환한다.
+        """
+        if not queries:
+            return []
+        if not self.counseling_data or not self.index:
+            return [[] for _ in queries]
+
+        try:
+            id_filter = self._id_filter(types, categories)
+            if id_filter is not None and not len(id_filter):
+                return [[] for _ in queries]
+            query_vectors = self._encode_queries(list(queries))
+            distances, indices = self._search_vectors(query_vectors, k, nprobe, ef_search, rerank_factor, id_filter)
+
+            results = []
+            for row_distances, row_indices in zip(distances, indices):
+                results.append([
+                    dict(self.counseling_data[idx], id=int(idx), distance=float(distance))
+                    for distance, idx in zip(row_distances, row_indices)
+                    if 0 <= idx < len(self.counseling_data)
+                ])
+            return results
+
+        except Exception as e:
+            print(f"일괄 유사 케이스 검색 중 오류: {str(e)}")
+            return [[] for _ in queries]
+
+    def _search_vectors(self, query_vectors: np.ndarray, k: int, nprobe: Optional[int] = None,
+                        ef_search: Optional[int] = None, rerank_factor: Optional[int] = None,
+                        id_filter: Optional[IdFilter] = None) -> tuple:
+        """쿼리 벡터 행렬 검색, (distances, indices) 반환"""
+        if rerank_factor is None:
+            rerank_factor = self.index_params.get('rerank_factor', 0)
+        query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32)
+        return search_index(self.index, query_vectors, k, nprobe, ef_search, rerank_factor, self.embeddings,
+                            id_filter)
+
+    def _dense_search(self, query_vector: np.ndarray, k: int, nprobe: Optional[int], ef_search: Optional[int],
+                      rerank_factor: Optional[int], types: Optional[List[str]], categories: Optional[List[str]],
+                      id_filter: Optional[IdFilter]) -> tuple:
+        """단일 쿼리 밀집 검색 단계, (distances, indices) 반환
+
+        라우팅이 켜져 있으면 웰니스 행은 쿼리와 가까운 route_categories 개 카테고리만 정확 검색하고,
+        나머지 유형의 행은 인덱스에서 검색해 거리 순으로 합친다.
+        """
+        if not self._use_routing(types, categories):
+            return self._search_vectors(query_vector, k, nprobe, ef_search, rerank_factor, id_filter)
+        distances, indices = self.category_router.search(query_vector, k, self.route_categories, self.embeddings)
+        other_types = [name for name in (types or self.get_type_counts()) if name != 'wellness']
+        if other_types:
+            other_distances, other_indices = self._search_vectors(
+                query_vector, k, nprobe, ef_search, rerank_factor, self._id_filter(other_types)
+            )
+            distances = np.hstack([distances, other_distances])
+            indices = np.hstack([indices, other_indices])
+            order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        return distances, indices
+
+    def _use_routing(self, types: Optional[List[str]], categories: Optional[List[str]]) -> bool:
+        """카테고리 라우팅 적용 여부 (라우팅이 켜져 있고 카테고리 지정 없이 웰니스 사례를 포함해 찾을 때)"""
+        return (self.route_categories is not None and self.category_router is not None
+                and self.embeddings is not None and not categories and (not types or 'wellness' in types))
+
+    def _id_filter(self, types: Optional[List[str]] = None,
+                   categories: Optional[List[str]] = None) -> Optional[IdFilter]:
+        """유형/카테고리 조건의 허용 행 집합 (조건별로 캐시, 코퍼스가 바뀌면 비움)"""
+        if not types and not categories:
+            return None
+        key = (frozenset(types or ()), frozenset(categories or ()))
+        with self._lock:
+            corpus, cache = self._filter_cache
+            if corpus is not self.counseling_data:
+                cache = {}
+                self._filter_cache = (self.counseling_data, cache)
+            id_filter = cache.get(key)
+            if id_filter is None:
+                id_filter = IdFilter(self.counseling_data.filter_mask(types, categories))
+                if len(cache) >= FILTER_CACHE_SIZE:
+                    cache.pop(next(iter(cache)))
+                cache[key] = id_filter
+        return id_filter
+
+    @staticmethod
+    def _index_sidecar_paths(file_path: str) -> Dict[str, str]:
+        """인덱스 파일 옆에 저장하는 매니페스트/임베딩/어휘 색인 경로"""
+        base = os.path.splitext(file_path)[0]
+        return {
+            'manifest': base + '.manifest.json',
+            'lexical': base + '.lexical',
+            'embeddings': base + '.embeddings.npy'
+        }
+
     def save_index(self, file_path: str) -> bool:
-        """FAISS 인덱스 저장"""
+        """FAISS 인덱스와 매니페스트, 임베딩, 어휘 색인 저장"""
         try:
-            faiss.write_index(self.index, file_path)
+            # 다른 프로세스가 메모리 매핑 중일 수 있으므로 새 파일에 쓰고 교체
+            sidecar = self._index_sidecar_paths(file_path)
+            faiss.write_index(self.index, file_path + ".tmp")
+            os.replace(file_path + ".tmp", file_path)
+            if self.embeddings is not None:
+                np.save(sidecar['embeddings'] + ".tmp.npy", np.ascontiguousarray(self.embeddings, dtype=np.float32))
+                os.replace(sidecar['embeddings'] + ".tmp.npy", sidecar['embeddings'])
+            if self.lexical_index is not None:
+                if os.path.exists(sidecar['lexical'] + ".tmp"):
+                    shutil.rmtree(sidecar['lexical'] + ".tmp")
+                self.lexical_index.save(sidecar['lexical'] + ".tmp")
+                if os.path.exists(sidecar['lexical']):
+                    shutil.rmtree(sidecar['lexical'])
+                os.replace(sidecar['lexical'] + ".tmp", sidecar['lexical'])
+            with open(sidecar['manifest'], 'w', encoding='utf-8') as f:
+                json.dump(self.build_manifest(), f, ensure_ascii=False, indent=2)
             return True
         except Exception as e:
             print(f"인덱스 저장 중 오류: {str(e)}")
             return False
     
     def load_index(self, file_path: str) -> bool:
-        """FAISS 인덱스 로드"""
+        """FAISS 인덱스 로드
+
+        load_counseling_data 이후에 호출한다. 매니페스트가 현재 원본 파일과 맞지 않으면
+        변경된 소스만 다시 임베딩해 인덱스를 갱신·저장하고, 갱신할 수 없으면 False를 반환한다.
+        """
         try:
-            self.index = faiss.read_index(file_path)
-            return True
+            sidecar = self._index_sidecar_paths(file_path)
+            if not os.path.exists(file_path) or not os.path.exists(sidecar['manifest']):
+                return False
+            with open(sidecar['manifest'], 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+            problems = self.check_manifest(manifest)
+            if not problems:
+                index = read_index_mmap(file_path)
+                if index.ntotal != len(self.counseling_data) or index.d != manifest['dimension']:
+                    print("인덱스가 매니페스트와 맞지 않습니다.")
+                    return False
+                self.index = index
+                if os.path.exists(sidecar['embeddings']):
+                    self.embeddings = np.load(sidecar['embeddings'], mmap_mode='r')
+                if os.path.exists(sidecar['lexical']):
+                    self.lexical_index = BM25Index.load(sidecar['lexical'])
+                else:
+                    self._build_lexical_index()
+                if self.embeddings is not None:
+                    self._build_category_router()
+                self.index_version += 1
+                return True
+
+            print(f"인덱스가 최신이 아닙니다: {', '.join(problems)}")
+            if not os.path.exists(sidecar['embeddings']):
+                return False
+            previous_embeddings = np.load(sidecar['embeddings'], mmap_mode='r')
+            reembedded = self.update_embeddings(manifest, previous_embeddings)
+            del previous_embeddings
+            if reembedded is None:
+                return False
+            print(f"다시 임베딩한 소스: {reembedded}")
+            return self.save_index(file_path)
+
         except Exception as e:
             print(f"인덱스 로드 중 오류: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    def bundle_saves_embeddings(self, save_embeddings: bool) -> bool:
+        """save_bundle 이 실제로 임베딩을 저장하는지 (재정렬을 쓰는 인덱스는 save_embeddings 와 관계없이 저장)"""
+        if save_embeddings:
+            return True
+        num_rows = len(self.counseling_data) if self.counseling_data else 0
+        return bool(resolve_params(self.index_type, num_rows, self.index_params).get('rerank_factor'))
+
+    @staticmethod
+    def _new_bundle_version(bundle_root: str) -> str:
+        """겹치지 않는 번들 버전 이름 (마이크로초까지의 시각-프로세스 번호, 이름 순서가 생성 순서)"""
+        base = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}"
+        version, counter = base, 1
+        while os.path.exists(os.path.join(bundle_root, version)) or \
+                os.path.exists(os.path.join(bundle_root, version + ".tmp")):
+            version = f"{base}-{counter}"
+            counter += 1
+        return version
+
+    @staticmethod
+    def _prune_bundles(bundle_root: str, keep: int, protected: List[str]):
+        """최근 keep 개와 protected 버전을 뺀 오래된 번들 버전 삭제
+
+        직전 CURRENT 는 실행 중인 워커가 아직 메모리 매핑하고 있을 수 있어 protected 로 남긴다.
+        """
+        current = DataProcessor.read_bundle_manifest(bundle_root)
+        if current:
+            # 다른 빌드가 그 사이 CURRENT 를 바꿨더라도 지금 CURRENT 가 가리키는 버전은 지우지 않음
+            protected = list(protected) + [os.path.basename(current[0])]
+        versions = []
+        for name in os.listdir(bundle_root):
+            manifest_path = os.path.join(bundle_root, name, BUNDLE_MANIFEST)
+            if not name.endswith(".tmp") and os.path.isfile(manifest_path):
+                versions.append(name)
+        for name in sorted(versions, reverse=True)[keep:]:
+            if name in protected:
+                continue
+            try:
+                shutil.rmtree(os.path.join(bundle_root, name))
+            except OSError as e:
+                print(f"이전 번들 삭제 실패 ({name}): {str(e)}")
+
+    def save_bundle(self, bundle_root: str, corpus_format: str = 'columnar', block_rows: int = 64,
+                    save_embeddings: bool = True, keep_versions: int = BUNDLE_KEEP_VERSIONS) -> Optional[str]:
+        """정규화 코퍼스, 임베딩, FAISS 인덱스, 매니페스트를 버전별 번들로 저장
+
+        bundle_root/<버전>/ 아래에 기록한 뒤 CURRENT 파일이 새 버전을 가리키도록 교체하고,
+        최근 keep_versions 개와 직전 CURRENT 를 뺀 오래된 버전은 삭제한다.
+        corpus_format='blocks' 이면 코퍼스를 block_rows 행 단위 압축 블록으로 저장한다.
+        save_embeddings=False 이면 float32 임베딩을 저장하지 않아 압축 인덱스의 디스크/메모리 절감이 그대로 남는다
+        (rerank_factor 재정렬에 필요하므로 재정렬을 쓰는 인덱스는 항상 저장하며, 없으면 카테고리 라우팅과
+        소수 행 필터 정확 검색은 쓰지 않는다). 성공 시 번들 디렉토리 경로를 반환한다.
+        """
+        try:
+            if self.index is None or self.embeddings is None or not self.counseling_data:
+                print("번들 저장 실패: 코퍼스 또는 임베딩이 없습니다.")
+                return None
+
+            os.makedirs(bundle_root, exist_ok=True)
+            version = self._new_bundle_version(bundle_root)
+            bundle_dir = os.path.join(bundle_root, version)
+            tmp_dir = bundle_dir + ".tmp"
+            os.makedirs(tmp_dir)
+
+            if corpus_format == 'blocks':
+                BlockCorpus.write(self.counseling_data, os.path.join(tmp_dir, BUNDLE_CORPUS), block_rows)
+            else:
+                self.counseling_data.save(os.path.join(tmp_dir, BUNDLE_CORPUS))
+            if not save_embeddings and self.bundle_saves_embeddings(False):
+                print("rerank_factor 재정렬에 필요해 임베딩을 함께 저장합니다.")
+                save_embeddings = True
+            if save_embeddings:
+                np.save(os.path.join(tmp_dir, BUNDLE_EMBEDDINGS),
+                        np.ascontiguousarray(self.embeddings, dtype=np.float32))
+            faiss.write_index(self.index, os.path.join(tmp_dir, BUNDLE_INDEX))
+            if self.lexical_index is not None:
+                self.lexical_index.save(os.path.join(tmp_dir, BUNDLE_LEXICAL))
+            if self.category_router is not None:
+                self.category_router.save(os.path.join(tmp_dir, BUNDLE_ROUTER))
+
+            manifest = self.build_manifest()
+            manifest.update({
+                'format_version': BUNDLE_FORMAT_VERSION,
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'type_counts': self.get_type_counts(),
+                'corpus_format': corpus_format,
+                'block_rows': block_rows if corpus_format == 'blocks' else None,
+                'files': {
+                    'corpus': BUNDLE_CORPUS,
+                    'embeddings': BUNDLE_EMBEDDINGS if save_embeddings else None,
+                    'index': BUNDLE_INDEX,
+                    'lexical': BUNDLE_LEXICAL if self.lexical_index is not None else None,
+                    'router': BUNDLE_ROUTER if self.category_router is not None else None
+                }
+            })
+            with open(os.path.join(tmp_dir, BUNDLE_MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            # 원자적 교체: 디렉토리 이동 후 CURRENT 포인터 갱신 (버전 이름이 겹치지 않아 기존 디렉토리를 덮지 않음)
+            current_path = os.path.join(bundle_root, BUNDLE_CURRENT)
+            previous_version = None
+            if os.path.exists(current_path):
+                with open(current_path, 'r', encoding='utf-8') as f:
+                    previous_version = f.read().strip()
+            os.replace(tmp_dir, bundle_dir)
+            current_tmp = os.path.join(bundle_root, BUNDLE_CURRENT + f".{os.getpid()}.tmp")
+            with open(current_tmp, 'w', encoding='utf-8') as f:
+                f.write(version)
+            os.replace(current_tmp, current_path)
+            self._prune_bundles(bundle_root, keep_versions, [version, previous_version])
+
+            self.bundle_manifest = manifest
+            return bundle_dir
+
+        except Exception as e:
+            print(f"번들 저장 중 오류: {str(e)}")
+            return None
+
+    @staticmethod
+    def read_bundle_manifest(bundle_root: str) -> Optional[tuple]:
+        """CURRENT 번들의 (디렉토리, 매니페스트) 반환, 없으면 None"""
+        current_path = os.path.join(bundle_root, BUNDLE_CURRENT)
+        if not os.path.exists(current_path):
+            return None
+        with open(current_path, 'r', encoding='utf-8') as f:
+            bundle_dir = os.path.join(bundle_root, f.read().strip())
+        with open(os.path.join(bundle_dir, BUNDLE_MANIFEST), 'r', encoding='utf-8') as f:
+            return bundle_dir, json.load(f)
+
+    def load_bundle(self, bundle_root: str, hot_blocks: int = 64) -> bool:
+        """사전 빌드된 번들 로드
+
+        인덱스, 임베딩, 코퍼스를 모두 읽기 전용 메모리 매핑으로 열어
+        여러 워커 프로세스가 페이지 캐시의 한 벌을 공유한다.
+        블록 압축 코퍼스는 검색된 행의 블록만 풀며 최근 hot_blocks 개 블록을 보관한다.
+        """
+        try:
+            current = self.read_bundle_manifest(bundle_root)
+            if current is None:
+                return False
+            bundle_dir, manifest = current
+
+            if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+                print(f"번들 포맷 버전 불일치: {manifest.get('format_version')}")
+                return False
+            if manifest.get('model_name') != self.model_name:
+                print(f"번들 모델 불일치: {manifest.get('model_name')} != {self.model_name}")
+                return False
+            # 백엔드/정밀도가 다르면 쿼리 벡터와 번들 벡터가 어긋나므로 다시 빌드하게 함
+            if manifest.get('encoder', 'torch-fp32') != self.encoder_id:
+                print(f"번들 인코더 불일치: {manifest.get('encoder', 'torch-fp32')} != {self.encoder_id}")
+                return False
+
+            files = manifest['files']
+            index = read_index_mmap(os.path.join(bundle_dir, files['index']))
+            embeddings = None
+            if files.get('embeddings'):
+                embeddings = np.load(os.path.join(bundle_dir, files['embeddings']), mmap_mode='r')
+            counseling_data = load_corpus(os.path.join(bundle_dir, files['corpus']), hot_blocks)
+
+            lexical_index = None
+            if files.get('lexical'):
+                lexical_index = BM25Index.load(os.path.join(bundle_dir, files['lexical']))
+            category_router = None
+            if files.get('router'):
+                category_router = CategoryRouter.load(
+                    os.path.join(bundle_dir, files['router']), counseling_data.category_codes
+                )
+
+            num_embeddings = index.ntotal if embeddings is None else embeddings.shape[0]
+            if not (len(counseling_data) == index.ntotal == num_embeddings == manifest['num_rows']):
+                print("번들 행 수 불일치: 코퍼스/임베딩/인덱스가 서로 맞지 않습니다.")
+                return False
+            if lexical_index is not None and len(lexical_index) != manifest['num_rows']:
+                print("번들 행 수 불일치: 어휘 색인이 코퍼스와 맞지 않습니다.")
+                return False
+
+            self.counseling_data = counseling_data
+            self.sources = manifest.get('sources', [])
+            self.index_type = manifest.get('index_type', 'flat')
+            self.index_params = manifest.get('index_params', {})
+            self.embeddings = embeddings
+            self.index = index
+            self.lexical_index = lexical_index
+            self.category_router = category_router
+            self.dedup_stats = manifest.get('dedup')
+            self.bundle_manifest = manifest
+            self.index_version += 1
+            return True
+
+        except Exception as e:
+            print(f"번들 로드 중 오류: {str(e)}")
+            return False
@@ -0,0 +1,124 @@
+# core/dedup.py
+import re
+import zlib
+import unicodedata
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+# MinHash: 31비트 해시 공간의 (a*h + b) mod p 순열
+MINHASH_PRIME = (1 << 31) - 1
+_WHITESPACE = re.compile(r"\s+")
+
+
+class UnionFind:
+    """행 번호 클러스터링용 분리 집합 (대표는 항상 가장 작은 행 번호)"""
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return int(root)
+
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if root_a < root_b:
+            self.parent[root_b] = root_a
+        else:
+            self.parent[root_a] = root_b
+        return True
+
+    def labels(self) -> np.ndarray:
+        return np.array([self.find(x) for x in range(len(self.parent))], dtype=np.int64)
+
+
+def shingles(text: str, size: int = 3) -> List[int]:
+    """공백을 정리한 문자 size-gram 의 32비트 해시 목록"""
+    text = _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text).strip().lower())
+    if len(text) <= size:
+        return [zlib.crc32(text.encode('utf-8'))]
+    return [zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)]
+
+
+def minhash_signatures(texts: List[str], num_perm: int = 64, shingle_size: int = 3,
+                       seed: int = 1234) -> np.ndarray:
+    """텍스트별 MinHash 서명 (len(texts), num_perm)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, MINHASH_PRIME, size=num_perm, dtype=np.int64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.int64)
+    for row, text in enumerate(texts):
+        hashes = np.array(shingles(text, shingle_size), dtype=np.int64) & MINHASH_PRIME
+        signatures[row] = ((hashes[:, None] * a + b) % MINHASH_PRIME).min(axis=0)
+    return signatures
+
+
+def minhash_duplicates(texts: List[str], union_find: UnionFind, threshold: float = 0.8,
+                       num_perm: int = 64, bands: int = 16) -> int:
+    """MinHash LSH 로 자카드 유사도가 threshold 이상인 텍스트를 묶고 병합 횟수 반환
+
+    같은 밴드 버킷에 들어온 행은 버킷의 첫 행과만 서명 일치율을 비교하므로 버킷 크기에 선형이다.
+    """
+    signatures = minhash_signatures(texts, num_perm)
+    rows_per_band = num_perm // bands
+    merged = 0
+    for band in range(bands):
+        buckets = {}
+        band_signatures = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        for row, key in enumerate(map(bytes, band_signatures)):
+            first = buckets.setdefault(key, row)
+            if first != row and (signatures[first] == signatures[row]).mean() >= threshold:
+                merged += union_find.union(first, row)
+    return merged
+
+
+def embedding_duplicates(embeddings: np.ndarray, union_find: UnionFind,
+                         search_fn: Callable[[np.ndarray, int], tuple], threshold: float = 0.95,
+                         neighbors: int = 8, chunk_rows: int = 4096) -> int:
+    """임베딩 최근접 이웃 중 코사인 유사도가 threshold 이상인 행을 묶고 병합 횟수 반환
+
+    search_fn(queries, k) -> (distances, ids) 로 후보를 찾고(보통 FAISS 인덱스 검색),
+    후보는 원본 벡터로 코사인 유사도를 다시 계산해 확인한다.
+    """
+    merged = 0
+    for start in range(0, len(embeddings), chunk_rows):
+        queries = np.asarray(embeddings[start:start + chunk_rows], dtype=np.float32)
+        _, candidate_ids = search_fn(queries, neighbors + 1)
+        query_norms = np.linalg.norm(queries, axis=1)
+        for offset, candidates in enumerate(candidate_ids):
+            row = start + offset
+            candidates = candidates[(candidates >= 0) & (candidates != row)]
+            if not len(candidates):
+                continue
+            vectors = np.asarray(embeddings[np.sort(candidates)], dtype=np.float32)
+            cosine = vectors @ queries[offset] / (np.linalg.norm(vectors, axis=1) * query_norms[offset] + 1e-12)
+            for candidate in np.sort(candidates)[cosine >= threshold]:
+                merged += union_find.union(row, int(candidate))
+    return merged
+
+
+def find_duplicate_clusters(texts: List[str], embeddings: Optional[np.ndarray] = None,
+                            search_fn: Optional[Callable[[np.ndarray, int], tuple]] = None,
+                            jaccard_threshold: float = 0.8, cosine_threshold: float = 0.95,
+                            neighbors: int = 8) -> Dict:
+    """텍스트 MinHash + 임베딩 코사인으로 중복 클러스터 탐색
+
+    {'labels': 행별 대표 행 번호, 'text_merges', 'embedding_merges'} 를 반환한다.
+    대표는 클러스터에서 가장 앞선 행이므로 원본 순서가 유지된다.
+    """
+    union_find = UnionFind(len(texts))
+    text_merges = minhash_duplicates(texts, union_find, jaccard_threshold)
+    embedding_merges = 0
+    if embeddings is not None and search_fn is not None and cosine_threshold < 1.0:
+        embedding_merges = embedding_duplicates(embeddings, union_find, search_fn, cosine_threshold, neighbors)
+    return {
+        'labels': union_find.labels(),
+        'text_merges': text_merges,
+        'embedding_merges': embedding_merges
+    }
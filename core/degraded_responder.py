@@ -0,0 +1,61 @@
+# core/degraded_responder.py
+from typing import Callable, Dict, List, Optional
+
+from core.data_processor import DataProcessor
+
+DEGRADED_NOTICE = "(지금은 답변 생성이 지연되고 있어, 비슷한 상담 사례를 바탕으로 먼저 답변드립니다.)"
+DEFAULT_REPLY = "이야기해 주셔서 고맙습니다. 지금 어떤 마음이신지 조금 더 자세히 들려주시겠어요?"
+CRISIS_RESOURCES = """🚨 전문가의 도움이 필요해 보입니다.
+
+긴급 연락처:
+📞 자살예방상담전화: 1393
+📞 정신건강상담전화: 1577-0199"""
+
+
+class DegradedResponder:
+    """LLM 없이 만드는 대체 응답
+
+    LLM 호출이 실패하거나 서킷 브레이커가 열렸거나 시간 예산을 넘겼을 때 사용한다.
+    가장 유사한 상담 사례의 상담사 답변을 그대로 쓴다. 이미 검색한 사례를 주면 다시 검색하지 않고,
+    없을 때만 검색한다 (재정렬/MMR 은 생략, 검색 결과 캐시가 켜져 있으면 그대로 활용).
+    crisis_detector 를 주면 위기 상황일 때 긴급 연락처를 덧붙인다.
+    """
+
+    def __init__(self, data_processor: DataProcessor, crisis_detector: Optional[Callable[[str], bool]] = None):
+        self.data_processor = data_processor
+        self.crisis_detector = crisis_detector
+        self.responses = 0
+
+    def _best_answer(self, query: str, cases: Optional[List[Dict]] = None) -> Optional[str]:
+        if not cases:
+            try:
+                cases = self.data_processor.find_similar_cases(query, k=1, hybrid=True)
+            except Exception as e:
+                print(f"대체 응답 검색 중 오류: {str(e)}")
+                return None
+        for case in cases:
+            answer = self._counselor_answer(case)
+            if answer:
+                return answer
+        return None
+
+    @staticmethod
+    def _counselor_answer(case: Dict) -> str:
+        """사례의 상담사 답변 (멀티턴은 첫 상담사 발화)"""
+        output = (case.get('output') or '').strip()
+        if case.get('type') == 'multi':
+            lines = [line for line in output.splitlines() if line.strip()]
+            output = lines[0].strip() if lines else ''
+            if output.startswith('상담사:'):
+                output = output[len('상담사:'):].strip()
+        return output
+
+    def respond(self, query: str, reason: Optional[str] = None, cases: Optional[List[Dict]] = None) -> str:
+        """대체 응답 텍스트 (reason 은 로그용: 'circuit_open', 'budget', 'error' 등, cases 는 이미 검색한 사례)"""
+        self.responses += 1
+        if reason:
+            print(f"대체 응답 사용: {reason}")
+        parts = [DEGRADED_NOTICE, self._best_answer(query, cases) or DEFAULT_REPLY]
+        if self.crisis_detector is not None and self.crisis_detector(query):
+            parts.append(CRISIS_RESOURCES)
+        return "\n\n".join(parts)
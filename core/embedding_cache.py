@@ -0,0 +1,143 @@
+# core/embedding_cache.py
+import os
+import hashlib
+import threading
+from typing import List, Tuple, Optional
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+KEY_SIZE = 16  # blake2b 다이제스트 바이트 수
+KEYS_FILE = "keys.bin"
+VECTORS_FILE = "vectors.f32"
+LOCK_FILE = ".lock"
+
+
+def text_key(text: str) -> bytes:
+    """텍스트 내용 해시 키"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=KEY_SIZE).digest()
+
+
+class EmbeddingCache:
+    """텍스트 해시 -> 임베딩 벡터 디스크 캐시
+
+    keys.bin 에는 행 순서대로 16바이트 키를, vectors.f32 에는 같은 순서로 float32 벡터를
+    이어 붙여 저장한다. 벡터 파일은 메모리 매핑으로 읽으므로 여러 프로세스가
+    같은 캐시 디렉토리를 공유할 수 있고, 추가는 파일 잠금으로 직렬화한다.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, dimension: int, namespace: str = "torch-fp32"):
+        self.dimension = dimension
+        self.row_bytes = dimension * 4
+        # 모델과 인코더 백엔드/정밀도(namespace)별로 디렉토리를 분리해 서로 다른 벡터가 섞이지 않도록 함
+        self.cache_dir = os.path.join(cache_dir, model_name.replace('/', '__'), namespace)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.keys_path = os.path.join(self.cache_dir, KEYS_FILE)
+        self.vectors_path = os.path.join(self.cache_dir, VECTORS_FILE)
+        self.lock_path = os.path.join(self.cache_dir, LOCK_FILE)
+        for path in (self.keys_path, self.vectors_path):
+            if not os.path.exists(path):
+                open(path, 'ab').close()
+
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._keys_size = 0
+        self._vectors = None
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _refresh(self):
+        """다른 프로세스가 추가한 키를 읽고 벡터 매핑 갱신"""
+        keys_size = os.path.getsize(self.keys_path)
+        if keys_size != self._keys_size:
+            with open(self.keys_path, 'rb') as f:
+                f.seek(self._keys_size)
+                data = f.read(keys_size - self._keys_size)
+            row = self._keys_size // KEY_SIZE
+            for offset in range(0, len(data) - KEY_SIZE + 1, KEY_SIZE):
+                self._rows.setdefault(data[offset:offset + KEY_SIZE], row)
+                row += 1
+            self._keys_size = row * KEY_SIZE
+
+        num_rows = self._keys_size // KEY_SIZE
+        if num_rows and (self._vectors is None or self._vectors.shape[0] < num_rows):
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode='r', shape=(num_rows, self.dimension)
+            )
+
+    def _file_lock(self):
+        """프로세스 간 추가 작업 잠금"""
+        handle = open(self.lock_path, 'a')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """단일 텍스트 벡터 조회"""
+        vectors, missing = self.lookup([text])
+        return None if missing else vectors[0]
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """텍스트 목록 조회, (벡터 배열, 캐시에 없는 위치 목록) 반환"""
+        keys = [text_key(text) for text in texts]
+        with self._lock:
+            if any(key not in self._rows for key in keys):
+                self._refresh()
+            result = np.zeros((len(texts), self.dimension), dtype=np.float32)
+            hit_positions = []
+            hit_rows = []
+            missing = []
+            for position, key in enumerate(keys):
+                row = self._rows.get(key)
+                if row is None:
+                    missing.append(position)
+                else:
+                    hit_positions.append(position)
+                    hit_rows.append(row)
+            if hit_rows:
+                result[hit_positions] = self._vectors[hit_rows]
+        return result, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """텍스트와 벡터 추가 (이미 있는 키는 건너뜀)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        with self._lock:
+            handle = self._file_lock()
+            try:
+                self._refresh()
+                new_keys = []
+                new_vectors = []
+                seen = set()
+                for text, vector in zip(texts, vectors):
+                    key = text_key(text)
+                    if key in self._rows or key in seen:
+                        continue
+                    seen.add(key)
+                    new_keys.append(key)
+                    new_vectors.append(vector)
+                if not new_keys:
+                    return
+
+                # 벡터를 먼저 기록한 뒤 키를 추가해, 키가 보이면 벡터도 항상 존재하도록 함
+                start_row = self._keys_size // KEY_SIZE
+                with open(self.vectors_path, 'r+b') as f:
+                    f.seek(start_row * self.row_bytes)
+                    f.write(np.vstack(new_vectors).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                with open(self.keys_path, 'r+b') as f:
+                    f.seek(self._keys_size)
+                    f.write(b''.join(new_keys))
+                    f.truncate()
+                self._refresh()
+            finally:
+                handle.close()
+
+    def put(self, text: str, vector: np.ndarray):
+        """단일 텍스트 벡터 추가"""
+        self.put_many([text], vector.reshape(1, -1))
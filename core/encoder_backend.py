@@ -0,0 +1,205 @@
+# core/encoder_backend.py
+import os
+import json
+import time
+from typing import Dict, List, Optional, Union
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime 미설치 시 torch 백엔드만 사용
+    ort = None
+
+ENCODER_CONFIG = "encoder_config.json"
+FP32_MODEL = "model.onnx"
+INT8_MODEL = "model.int8.onnx"
+
+# 검증용 기본 문장 (torch 출력과 코사인 유사도 비교)
+VERIFY_TEXTS = [
+    "안녕하세요",
+    "요즘 잠이 안 와요. 밤마다 생각이 너무 많아져요.",
+    "회사에서 상사 때문에 스트레스를 많이 받고 있어요.",
+    "친구랑 싸우고 나서 계속 마음이 불편해요.",
+    "아무것도 하기 싫고 무기력해요.",
+    "시험이 얼마 남지 않아서 너무 불안합니다.",
+    "가족들과 대화가 잘 안 통해서 외로워요.",
+    "오늘은 기분이 좋아서 이야기하고 싶었어요!",
+]
+
+
+def onnx_model_dir(base_dir: str, model_name: str) -> str:
+    """모델별 ONNX 저장 경로"""
+    return os.path.join(base_dir, model_name.replace('/', '__'))
+
+
+def set_cpu_affinity(cpus: Optional[List[int]]):
+    """현재 프로세스를 지정한 CPU 코어에 고정 (Linux 전용)"""
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, set(cpus))
+
+
+class OnnxSentenceEncoder:
+    """ONNX Runtime 기반 문장 인코더
+
+    SentenceTransformer 와 같은 encode() 인터페이스를 제공하며,
+    토큰화 후 ONNX 트랜스포머 출력에 풀링(mean/cls)과 정규화를 numpy 로 적용한다.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, num_threads: Optional[int] = None):
+        if ort is None:
+            raise ImportError("onnxruntime 이 설치되어 있지 않습니다.")
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ENCODER_CONFIG), 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        model_path = os.path.join(model_dir, INT8_MODEL if quantized else FP32_MODEL)
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.quantized = quantized
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        outputs = []
+        for i in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[i:i + batch_size], padding=True, truncation=True,
+                max_length=self.config['max_seq_length'], return_tensors='np'
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            hidden = self.session.run(None, feeds)[0]
+            outputs.append(self._pool(hidden, tokens['attention_mask']))
+        embeddings = np.vstack(outputs) if outputs else np.zeros((0, self.config['dimension']), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.config['pooling'] == 'cls':
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config.get('normalize'):
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+def export_onnx(model, model_dir: str, opset_version: int = 14) -> Dict:
+    """SentenceTransformer 를 ONNX 로 내보내고 int8 동적 양자화 모델 생성"""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(model_dir, exist_ok=True)
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    module_names = [type(module).__name__ for module in model]
+    pooling_module = next((module for module in model if type(module).__name__ == 'Pooling'), None)
+    pooling = 'cls' if pooling_module is not None and getattr(pooling_module, 'pooling_mode_cls_token', False) else 'mean'
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.encoder(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    dummy = tokenizer(["안녕하세요"], return_tensors='pt')
+    token_type_ids = dummy.get('token_type_ids', torch.zeros_like(dummy['input_ids']))
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in ('input_ids', 'attention_mask', 'token_type_ids')}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    fp32_path = os.path.join(model_dir, FP32_MODEL)
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStates(transformer),
+            (dummy['input_ids'], dummy['attention_mask'], token_type_ids),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version
+        )
+    quantize_dynamic(fp32_path, os.path.join(model_dir, INT8_MODEL), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(model_dir)
+    config = {
+        'pooling': pooling,
+        'normalize': 'Normalize' in module_names,
+        'max_seq_length': int(model.max_seq_length),
+        'dimension': int(model.get_sentence_embedding_dimension())
+    }
+    with open(os.path.join(model_dir, ENCODER_CONFIG), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return config
+
+
+def verify_encoder(reference, candidate, texts: Optional[List[str]] = None, repeats: int = 3) -> Dict:
+    """기준(torch) 인코더 대비 코사인 유사도와 속도 비교"""
+    texts = texts or VERIFY_TEXTS
+
+    def timed(encoder):
+        encoder.encode(texts, convert_to_numpy=True, show_progress_bar=False)  # 워밍업
+        start = time.perf_counter()
+        for _ in range(repeats):
+            vectors = encoder.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32), (time.perf_counter() - start) / repeats
+
+    expected, reference_seconds = timed(reference)
+    actual, candidate_seconds = timed(candidate)
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1) + 1e-12
+    )
+    return {
+        'min_cosine': float(cosine.min()),
+        'mean_cosine': float(cosine.mean()),
+        'speedup': reference_seconds / candidate_seconds if candidate_seconds else 0.0
+    }
+
+
+def load_onnx_encoder(model_name: str, onnx_dir: str = "data/onnx", quantized: bool = True,
+                      num_threads: Optional[int] = None, min_cosine: float = 0.99):
+    """ONNX 인코더 로드 (없으면 내보내기 후 torch 출력과 검증)
+
+    검증을 통과하지 못하면 ValueError 를 발생시킨다. 검증 결과는 설정 파일에 기록되어
+    이후 로드에서는 torch 모델을 다시 읽지 않는다.
+    """
+    model_dir = onnx_model_dir(onnx_dir, model_name)
+    config_path = os.path.join(model_dir, ENCODER_CONFIG)
+    verify_key = 'verified_int8' if quantized else 'verified_fp32'
+
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        if config.get(verify_key, {}).get('min_cosine', 0.0) >= min_cosine:
+            return OnnxSentenceEncoder(model_dir, quantized, num_threads)
+
+    from sentence_transformers import SentenceTransformer
+    reference = SentenceTransformer(model_name, device='cpu')
+    if not os.path.exists(config_path):
+        export_onnx(reference, model_dir)
+
+    encoder = OnnxSentenceEncoder(model_dir, quantized, num_threads)
+    result = verify_encoder(reference, encoder)
+    print(f"ONNX 인코더 검증 ({'int8' if quantized else 'fp32'}): "
+          f"최소 코사인 {result['min_cosine']:.4f}, 속도 {result['speedup']:.1f}배")
+    if result['min_cosine'] < min_cosine:
+        raise ValueError(f"ONNX 인코더 출력이 허용 오차를 벗어났습니다: {result['min_cosine']:.4f} < {min_cosine}")
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config[verify_key] = result
+    with open(config_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return encoder
@@ -0,0 +1,96 @@
+# core/encoder_service.py
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+import numpy as np
+
+_STOP = object()
+
+
+class BatchingEncoder:
+    """동시 인코딩 요청을 짧은 시간 창 동안 모아 한 번의 배치로 처리하는 백그라운드 워커
+
+    각 호출자는 Future 로 자신의 벡터를 받는다. 첫 요청이 도착한 뒤 max_wait_ms 동안
+    (또는 max_batch_size 가 찰 때까지) 들어온 요청을 묶어 encode_fn 을 한 번 호출한다.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_seen = 0
+        self._worker = threading.Thread(target=self._run, name="batching-encoder", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """인코딩 요청 등록"""
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, text: str, timeout: float = None) -> np.ndarray:
+        """단일 텍스트 인코딩 (배치 처리 완료까지 대기)"""
+        return self.submit(text).result(timeout=timeout)
+
+    def close(self):
+        """워커 종료"""
+        self._queue.put(_STOP)
+        self._worker.join(timeout=1.0)
+
+    def get_stats(self) -> Dict:
+        """배치 처리 통계"""
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': self._items / self._batches if self._batches else 0.0,
+                'max_batch_size': self._max_seen
+            }
+
+    def _collect(self, first) -> list:
+        """첫 요청 이후 시간 창 안에 들어온 요청 수집"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            # 취소된 요청은 제외
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = self.encode_fn([text for text, _ in batch])
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
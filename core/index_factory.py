@@ -0,0 +1,390 @@
+# core/index_factory.py
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import faiss
+
+# 지원하는 인덱스 유형과 기본 파라미터
+# rerank_factor > 0 이면 k * rerank_factor 개 후보를 뽑아 float32 원본 벡터로 다시 정렬
+INDEX_TYPES = {
+    'flat': {},
+    'ivf_flat': {'nlist': None, 'nprobe': 8},
+    'ivf_pq': {'nlist': None, 'm': 64, 'nbits': 8, 'nprobe': 16, 'rerank_factor': 0},
+    'hnsw': {'M': 32, 'ef_construction': 80, 'ef_search': 64},
+    # 압축 저장 (전수 탐색): float16 2배, int8 4배, PQ dimension*4/m 배 (768차원, m=192 기준 16배)
+    # PQ 학습/검색 시간은 m 에 비례 (6천x768, 1코어: m=96 17초, m=192 52초, rerank 4 recall@10 0.78 / 0.96)
+    'sq_fp16': {'rerank_factor': 0},
+    'sq8': {'rerank_factor': 4},
+    'pq': {'m': 192, 'nbits': 8, 'rerank_factor': 4},
+}
+
+# 학습 샘플 크기 (faiss 권장: 클러스터당 39개 이상)
+TRAIN_POINTS_PER_CENTROID = 39
+MAX_TRAIN_SIZE = 100000
+
+# 필터 허용 행이 이보다 적으면 인덱스 대신 원본 벡터로 정확 검색 (선택도가 높을수록 더 빠름)
+EXACT_FILTER_MAX = 2048
+EXACT_CHUNK_ROWS = 65536
+
+
+class IdFilter:
+    """검색 허용 행 집합
+
+    FAISS 비트맵 선택자(인덱스 내부에서 허용되지 않은 행을 건너뜀)와
+    정확 검색용 행 번호 배열을 함께 보관한다. 선택자가 참조하는 비트맵도 이 객체가 소유한다.
+    """
+
+    def __init__(self, mask: np.ndarray):
+        self.mask = np.asarray(mask, dtype=bool)
+        self.ids = np.flatnonzero(self.mask).astype(np.int64)
+        self._bitmap = np.packbits(self.mask, bitorder='little')
+        self.selector = faiss.IDSelectorBitmap(len(self.mask), faiss.swig_ptr(self._bitmap))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def default_nlist(num_rows: int) -> int:
+    """코퍼스 크기에 맞는 IVF 클러스터 수 (약 4*sqrt(N))"""
+    return int(max(1, min(4 * int(np.sqrt(num_rows)), num_rows // TRAIN_POINTS_PER_CENTROID)))
+
+
+def resolve_params(index_type: str, num_rows: int, params: Optional[Dict] = None) -> Dict:
+    """기본값과 사용자 파라미터 병합"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 인덱스 유형: {index_type} (가능: {', '.join(INDEX_TYPES)})")
+    resolved = dict(INDEX_TYPES[index_type])
+    resolved.update({key: value for key, value in (params or {}).items() if value is not None})
+    if 'nlist' in resolved and resolved['nlist'] is None:
+        resolved['nlist'] = default_nlist(num_rows)
+    return resolved
+
+
+def factory_string(index_type: str, dimension: int, params: Dict) -> str:
+    """faiss.index_factory 설명 문자열"""
+    if index_type == 'flat':
+        return "Flat"
+    if index_type == 'ivf_flat':
+        return f"IVF{params['nlist']},Flat"
+    if index_type in ('ivf_pq', 'pq') and dimension % params['m'] != 0:
+        raise ValueError(f"PQ 서브벡터 수 m={params['m']}이 차원 {dimension}의 약수가 아닙니다.")
+    # np: 폴리세믹 학습 생략 (해밍 거리 필터 검색을 쓰지 않으므로 학습 시간만 늘어남, m 이 크면 수 분)
+    if index_type == 'ivf_pq':
+        return f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}np"
+    if index_type == 'hnsw':
+        return f"HNSW{params['M']}"
+    if index_type == 'sq_fp16':
+        return "SQfp16"
+    if index_type == 'sq8':
+        return "SQ8"
+    if index_type == 'pq':
+        return f"PQ{params['m']}x{params['nbits']}np"
+    raise ValueError(f"지원하지 않는 인덱스 유형: {index_type}")
+
+
+def build_index(embeddings: np.ndarray, index_type: str = 'flat', params: Optional[Dict] = None,
+                seed: int = 1234) -> faiss.Index:
+    """인덱스 생성, 학습이 필요한 유형은 코퍼스 샘플로 학습"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_rows, dimension = embeddings.shape
+    params = resolve_params(index_type, num_rows, params)
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(dimension)
+    else:
+        index = faiss.index_factory(dimension, factory_string(index_type, dimension, params))
+        if index_type == 'hnsw':
+            index.hnsw.efConstruction = params['ef_construction']
+
+    if not index.is_trained:
+        train_size = min(num_rows, MAX_TRAIN_SIZE, max(
+            params.get('nlist', 1), 2 ** params.get('nbits', 0)
+        ) * TRAIN_POINTS_PER_CENTROID)
+        sample = np.random.default_rng(seed).choice(num_rows, size=train_size, replace=False)
+        index.train(embeddings[np.sort(sample)])
+
+    index.add(embeddings)
+    apply_search_defaults(index, params)
+    return index
+
+
+def apply_search_defaults(index: faiss.Index, params: Dict):
+    """인덱스에 기본 검색 파라미터(nprobe/efSearch) 설정"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and params.get('nprobe'):
+        ivf.nprobe = int(params['nprobe'])
+    if isinstance(index, faiss.IndexHNSW) and params.get('ef_search'):
+        index.hnsw.efSearch = int(params['ef_search'])
+
+
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """쿼리별 검색 파라미터 (인덱스 공유 상태를 바꾸지 않아 스레드 안전)
+
+    selector 를 주면 허용된 행만 검색한다. 지정하지 않은 nprobe/efSearch 는 인덱스 기본값을 따른다.
+    """
+    extra = {'sel': selector} if selector is not None else {}
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and (nprobe or extra):
+        return faiss.SearchParametersIVF(nprobe=int(nprobe or ivf.nprobe), **extra)
+    if isinstance(index, faiss.IndexHNSW) and (ef_search or extra):
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search or index.hnsw.efSearch), **extra)
+    if extra:
+        return faiss.SearchParameters(**extra)
+    return None
+
+
+def supports_selector(index: faiss.Index) -> bool:
+    """검색 파라미터 선택자 지원 여부 (IndexPQ 는 미지원)"""
+    return not isinstance(index, faiss.IndexPQ)
+
+
+def prefer_exact_filter(index: faiss.Index, num_allowed: int, nprobe: Optional[int] = None) -> bool:
+    """허용 행만 정확 검색하는 편이 인덱스 검색보다 싼지 판단
+
+    IVF 는 쿼리당 약 ntotal * nprobe / nlist 행을 훑으므로 허용 행이 그보다 적으면 정확 검색이 싸다.
+    그 밖의 인덱스는 허용 행이 EXACT_FILTER_MAX 이하일 때 정확 검색한다 (HNSW 는 선택도가 높을수록
+    그래프 탐색 recall 이 떨어지므로 정확 검색이 더 정확하기도 하다).
+    """
+    if not supports_selector(index):
+        return True
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return num_allowed <= index.ntotal * int(nprobe or ivf.nprobe) / ivf.nlist
+    return num_allowed <= EXACT_FILTER_MAX
+
+
+def post_filter_search(index: faiss.Index, queries: np.ndarray, k: int, id_filter: 'IdFilter',
+                       rerank_factor: int = 0, embeddings: Optional[np.ndarray] = None) -> Optional[tuple]:
+    """선택자를 지원하지 않는 인덱스용: 허용 비율만큼 후보를 더 뽑은 뒤 허용 행만 남김
+
+    어떤 쿼리든 허용 후보가 k개보다 적으면 None 을 반환한다 (호출자가 정확 검색으로 대체).
+    """
+    expand = 2 * int(np.ceil(index.ntotal / max(len(id_filter), 1)))
+    fetch_k = min(k * max(int(rerank_factor or 1), 1) * expand, index.ntotal)
+    distances, candidate_ids = index.search(queries, fetch_k)
+    allowed = (candidate_ids >= 0) & id_filter.mask[np.clip(candidate_ids, 0, None)]
+    if (allowed.sum(axis=1) < k).any():
+        return None
+    if rerank_factor and rerank_factor > 1 and embeddings is not None:
+        return rerank_exact(queries, np.where(allowed, candidate_ids, -1), embeddings, k)
+    first = np.argsort(~allowed, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(distances, first, axis=1), np.take_along_axis(candidate_ids, first, axis=1)
+
+
+def exact_subset_search(queries: np.ndarray, ids: np.ndarray, embeddings: np.ndarray, k: int) -> tuple:
+    """허용 행만 원본 벡터로 정확 검색, 행이 많으면 구간별로 읽어 상위 k개 유지"""
+    queries = np.asarray(queries, dtype=np.float32)
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for start in range(0, len(ids), EXACT_CHUNK_ROWS):
+        chunk_ids = ids[start:start + EXACT_CHUNK_ROWS]
+        vectors = np.asarray(embeddings[chunk_ids], dtype=np.float32)
+        chunk_distances = (
+            (queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)
+        )
+        merged_distances = np.hstack([distances, chunk_distances])
+        merged_ids = np.hstack([result_ids, np.broadcast_to(chunk_ids, chunk_distances.shape)])
+        top = np.argpartition(merged_distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(merged_distances, top, axis=1)
+        result_ids = np.take_along_axis(merged_ids, top, axis=1)
+    order = np.argsort(distances, axis=1, kind='stable')
+    distances = np.take_along_axis(distances, order, axis=1)
+    result_ids = np.take_along_axis(result_ids, order, axis=1)
+    result_ids[~np.isfinite(distances)] = -1
+    return distances, result_ids
+
+
+def rerank_exact(queries: np.ndarray, candidate_ids: np.ndarray, embeddings: np.ndarray,
+                 k: int) -> tuple:
+    """후보를 float32 원본 벡터와의 정확한 L2 거리로 다시 정렬해 상위 k개 반환
+
+    embeddings 는 메모리 매핑 배열이어도 되며, 후보 행만 읽는다.
+    """
+    queries = np.asarray(queries, dtype=np.float32).reshape(len(candidate_ids), -1)
+    distances = np.full((len(candidate_ids), k), np.inf, dtype=np.float32)
+    ids = np.full((len(candidate_ids), k), -1, dtype=np.int64)
+    for row, (query, candidates) in enumerate(zip(queries, candidate_ids)):
+        candidates = np.sort(candidates[candidates >= 0])
+        if not len(candidates):
+            continue
+        vectors = np.asarray(embeddings[candidates], dtype=np.float32)
+        exact = ((vectors - query) ** 2).sum(axis=1)
+        top = np.argsort(exact)[:k]
+        distances[row, :len(top)] = exact[top]
+        ids[row, :len(top)] = candidates[top]
+    return distances, ids
+
+
+def search_index(index: faiss.Index, queries: np.ndarray, k: int, nprobe: Optional[int] = None,
+                 ef_search: Optional[int] = None, rerank_factor: int = 0,
+                 embeddings: Optional[np.ndarray] = None, id_filter: Optional[IdFilter] = None) -> tuple:
+    """검색 파라미터와 정확 재정렬을 적용한 검색, (distances, ids) 반환
+
+    id_filter 가 있으면 허용된 행만 검색한다. 허용 행이 인덱스가 훑을 행보다 적거나 인덱스가 선택자를
+    지원하지 않으면 허용 행의 원본 벡터만 정확 검색하므로 필터 검색 비용이 전체 검색보다 커지지 않는다.
+    """
+    selector = None
+    if id_filter is not None:
+        if not supports_selector(index) and (len(id_filter) > EXACT_FILTER_MAX or embeddings is None):
+            result = post_filter_search(index, queries, k, id_filter, rerank_factor, embeddings)
+            if result is not None:
+                return result
+        if embeddings is not None and prefer_exact_filter(index, len(id_filter), nprobe):
+            return exact_subset_search(queries, id_filter.ids, embeddings, k)
+        if not supports_selector(index):
+            raise ValueError(f"{type(index).__name__} 인덱스는 필터 검색에 원본 임베딩이 필요합니다.")
+        selector = id_filter.selector
+    params = search_parameters(index, nprobe, ef_search, selector)
+    if rerank_factor and rerank_factor > 1 and embeddings is not None:
+        fetch_k = min(k * int(rerank_factor), index.ntotal)
+        _, candidate_ids = index.search(queries, fetch_k, params=params)
+        return rerank_exact(queries, candidate_ids, embeddings, k)
+    return index.search(queries, k, params=params)
+
+
+def read_index_mmap(file_path: str) -> faiss.Index:
+    """인덱스를 메모리 매핑으로 읽기 (여러 프로세스가 페이지 캐시를 공유)
+
+    매핑된 인덱스는 읽기 전용으로 사용해야 한다. 매핑을 지원하지 않는 경우 일반 로드로 대체한다.
+    """
+    try:
+        return faiss.read_index(file_path, faiss.IO_FLAG_MMAP_IFC)
+    except RuntimeError:
+        return faiss.read_index(file_path)
+
+
+def reconstruct_vectors(index: faiss.Index, ids: np.ndarray, embeddings: Optional[np.ndarray] = None) -> np.ndarray:
+    """행 번호의 벡터 복원 (float32 임베딩이 있으면 그 행을, 없으면 인덱스에서 복원)
+
+    IVF 인덱스는 복원에 행 번호 -> 리스트 위치 매핑이 필요하므로 처음 한 번 만든다.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if embeddings is not None:
+        order = np.argsort(ids)
+        vectors = np.empty((len(ids), embeddings.shape[1]), dtype=np.float32)
+        vectors[order] = embeddings[ids[order]]
+        return vectors
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.no():
+        ivf.make_direct_map()
+    return index.reconstruct_batch(ids)
+
+
+def mmr_select(query: np.ndarray, vectors: np.ndarray, k: int, lambda_: float = 0.7,
+               relevance: Optional[np.ndarray] = None) -> np.ndarray:
+    """최대 한계 관련성(MMR)으로 후보 중 다양한 k개 선택, 선택 순서의 후보 위치 반환
+
+    점수 = lambda * 관련성 - (1 - lambda) * 이미 고른 후보와의 최대 코사인 유사도.
+    관련성은 주어지지 않으면 쿼리와의 코사인 유사도다. 후보 간 유사도 행렬을 한 번 계산하고
+    선택할 때마다 최대 유사도 벡터만 갱신하므로 반복은 k번뿐이다.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    normalized = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    if relevance is None:
+        query = np.asarray(query, dtype=np.float32).ravel()
+        relevance = normalized @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = normalized @ normalized.T
+
+    selected = np.empty(k, dtype=np.int64)
+    max_similarity = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    for step in range(k):
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        scores = np.where(available, lambda_ * relevance - (1.0 - lambda_) * redundancy, -np.inf)
+        choice = int(np.argmax(scores))
+        selected[step] = choice
+        available[choice] = False
+        np.maximum(max_similarity, similarity[choice], out=max_similarity)
+    return selected
+
+
+def index_size_bytes(index: faiss.Index) -> int:
+    """직렬화 기준 인덱스 크기"""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """정확 검색 결과 대비 recall@k"""
+    k = exact_ids.shape[1]
+    hits = sum(len(set(approx[approx >= 0]) & set(exact)) for approx, exact in zip(approx_ids, exact_ids))
+    return hits / float(k * len(exact_ids))
+
+
+def evaluate_index(index: faiss.Index, queries: np.ndarray, exact_ids: np.ndarray, k: int,
+                   nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                   rerank_factor: int = 0, embeddings: Optional[np.ndarray] = None) -> Dict:
+    """단건 쿼리 지연 시간과 recall@k 측정"""
+    latencies = []
+    approx_ids = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = search_index(index, query.reshape(1, -1), k, nprobe, ef_search, rerank_factor, embeddings)
+        latencies.append((time.perf_counter() - start) * 1000)
+        approx_ids[i] = ids[0]
+    return {
+        'recall': recall_at_k(approx_ids, exact_ids),
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95)),
+        'size_bytes': index_size_bytes(index)
+    }
+
+
+def benchmark_index_types(embeddings: np.ndarray, index_types: List[str], num_queries: int = 200,
+                          k: int = 10, params: Optional[Dict[str, Dict]] = None, seed: int = 1234,
+                          nprobe_values: Optional[List[int]] = None,
+                          ef_search_values: Optional[List[int]] = None,
+                          rerank_values: Optional[List[int]] = None) -> List[Dict]:
+    """인덱스 유형별 빌드 시간, 지연 시간, 크기, flat 대비 recall 비교
+
+    nprobe_values/ef_search_values 를 주면 IVF/HNSW 인덱스를, rerank_values 를 주면
+    압축 인덱스(sq/pq)를 해당 값별로 추가 측정한다.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(embeddings), size=min(num_queries, len(embeddings)), replace=False)
+    queries = embeddings[query_rows]
+
+    baseline = build_index(embeddings, 'flat')
+    _, exact_ids = baseline.search(queries, k)
+
+    flat_size = index_size_bytes(baseline)
+    results = []
+    for index_type in ['flat'] + [t for t in index_types if t != 'flat']:
+        type_params = (params or {}).get(index_type)
+        start = time.perf_counter()
+        try:
+            index = baseline if index_type == 'flat' else build_index(embeddings, index_type, type_params, seed)
+        except Exception as e:
+            print(f"{index_type} 인덱스 생성 실패: {str(e)}")
+            continue
+        build_seconds = time.perf_counter() - start
+        resolved = resolve_params(index_type, len(embeddings), type_params)
+
+        sweeps = [{}]
+        if faiss.try_extract_index_ivf(index) is not None:
+            sweeps += [{'nprobe': value} for value in (nprobe_values or [])]
+        if isinstance(index, faiss.IndexHNSW):
+            sweeps += [{'ef_search': value} for value in (ef_search_values or [])]
+        if 'rerank_factor' in resolved:
+            sweeps += [{'rerank_factor': value} for value in (rerank_values or [])
+                       if value != resolved['rerank_factor']]
+
+        for sweep in sweeps:
+            sweep_params = dict(resolved, **sweep)
+            result = evaluate_index(
+                index, queries, exact_ids, k, sweep.get('nprobe'), sweep.get('ef_search'),
+                sweep_params.get('rerank_factor', 0), embeddings
+            )
+            result.update({
+                'index_type': index_type,
+                'params': sweep_params,
+                'build_seconds': build_seconds,
+                'compression': flat_size / float(result['size_bytes'])
+            })
+            results.append(result)
+    return results
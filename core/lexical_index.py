@@ -0,0 +1,154 @@
+# core/lexical_index.py
+import os
+import re
+import json
+import math
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+LEXICAL_META = "lexical_meta.json"
+LEXICAL_VOCAB = "vocab.json"
+LEXICAL_COLUMNS = ('term_offsets', 'postings_docs', 'postings_tf', 'doc_lengths')
+
+# 구두점/기호는 공백으로 (한글·영문·숫자만 남김)
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """어절별 문자 n-gram (n보다 짧은 어절은 그대로 하나의 토큰)
+
+    형태소 분석기 없이 조사/어미가 붙은 한국어 어절끼리도 어간 부분이 겹치도록 한다.
+    """
+    text = _NON_WORD.sub(' ', unicodedata.normalize('NFC', text).lower())
+    grams = []
+    for word in text.split():
+        if len(word) <= n:
+            grams.append(word)
+        else:
+            grams.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return grams
+
+
+class BM25Index:
+    """문자 n-gram BM25 역색인
+
+    용어별 포스팅(문서 번호, 빈도)을 용어 순서로 이어 붙인 배열과 용어 시작 위치 배열로 저장한다.
+    문서 번호는 FAISS 행 번호와 같으며, 파일에서 읽으면 포스팅은 읽기 전용 메모리 매핑이다.
+    """
+
+    def __init__(self, vocab: Dict[str, int], columns: Dict[str, np.ndarray], n: int = 2,
+                 k1: float = 1.2, b: float = 0.75):
+        self.vocab = vocab
+        self.n = n
+        self.k1 = k1
+        self.b = b
+        self.term_offsets = columns['term_offsets']
+        self.postings_docs = columns['postings_docs']
+        self.postings_tf = columns['postings_tf']
+        self.doc_lengths = columns['doc_lengths']
+        self.avgdl = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], n: int = 2, k1: float = 1.2, b: float = 0.75) -> 'BM25Index':
+        vocab = {}
+        term_ids = array('i')
+        doc_ids = array('i')
+        tfs = array('H')
+        doc_lengths = array('i')
+        for doc_id, text in enumerate(texts):
+            grams = char_ngrams(text, n)
+            doc_lengths.append(len(grams))
+            for gram, tf in Counter(grams).items():
+                term_ids.append(vocab.setdefault(gram, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(min(tf, 0xFFFF))
+
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        # 용어 순, 같은 용어 안에서는 문서 순으로 정렬
+        order = np.argsort(term_ids, kind='stable')
+        term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=term_offsets[1:])
+        columns = {
+            'term_offsets': term_offsets,
+            'postings_docs': np.frombuffer(doc_ids, dtype=np.int32)[order],
+            'postings_tf': np.frombuffer(tfs, dtype=np.uint16)[order],
+            'doc_lengths': np.frombuffer(doc_lengths, dtype=np.int32).copy()
+        }
+        return cls(vocab, columns, n, k1, b)
+
+    def save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+        for name in LEXICAL_COLUMNS:
+            np.save(os.path.join(index_dir, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        with open(os.path.join(index_dir, LEXICAL_VOCAB), 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(index_dir, LEXICAL_META), 'w', encoding='utf-8') as f:
+            json.dump({'num_docs': len(self), 'n': self.n, 'k1': self.k1, 'b': self.b}, f, indent=2)
+
+    @classmethod
+    def load(cls, index_dir: str, mmap: bool = True) -> 'BM25Index':
+        with open(os.path.join(index_dir, LEXICAL_META), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, LEXICAL_VOCAB), 'r', encoding='utf-8') as f:
+            vocab = {term: term_id for term_id, term in enumerate(json.load(f))}
+        columns = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode='r' if mmap else None)
+            for name in LEXICAL_COLUMNS
+        }
+        index = cls(vocab, columns, meta['n'], meta['k1'], meta['b'])
+        if len(index) != meta['num_docs']:
+            raise ValueError(f"어휘 색인 문서 수 불일치: {len(index)} != {meta['num_docs']}")
+        return index
+
+    def search(self, query: str, k: int = 10, mask: Optional[np.ndarray] = None) -> tuple:
+        """BM25 상위 k개 문서, (scores, ids) 반환 (점수 내림차순, 일치 문서가 적으면 더 짧음)
+
+        mask 를 주면 mask[문서 번호]가 참인 문서만 점수를 매긴다.
+        """
+        num_docs = len(self)
+        doc_parts, score_parts = [], []
+        for gram, query_tf in Counter(char_ngrams(query, self.n)).items():
+            term_id = self.vocab.get(gram)
+            if term_id is None:
+                continue
+            start, end = int(self.term_offsets[term_id]), int(self.term_offsets[term_id + 1])
+            docs = np.asarray(self.postings_docs[start:end])
+            tf = np.asarray(self.postings_tf[start:end], dtype=np.float32)
+            idf = math.log(1.0 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            if mask is not None:
+                allowed = mask[docs]
+                docs, tf = docs[allowed], tf[allowed]
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths[docs] / self.avgdl)
+            doc_parts.append(docs)
+            score_parts.append(query_tf * idf * tf * (self.k1 + 1.0) / (tf + norm))
+
+        if not doc_parts:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts)).astype(np.float32)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return scores[top], docs[top].astype(np.int64)
+
+
+def reciprocal_rank_fusion(ranked_lists: List[np.ndarray], k: int, rrf_k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[int]:
+    """여러 순위 목록을 RRF(Σ w / (rrf_k + 순위))로 합쳐 상위 k개 문서 번호 반환"""
+    weights = weights or [1.0] * len(ranked_lists)
+    fused = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, doc_id in enumerate(int(doc_id) for doc_id in ranked if doc_id >= 0):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (rrf_k + rank + 1)
+    return sorted(fused, key=lambda doc_id: -fused[doc_id])[:k]
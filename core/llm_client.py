@@ -0,0 +1,322 @@
+# core/llm_client.py
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+
+import httpx
+import openai
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# 연결 풀: 동시 요청 상한과 유휴 keep-alive 연결 수 (TLS 핸드셰이크 재사용)
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0)
+# 단계별 타임아웃(초): 연결, 스트리밍 조각 사이 대기, 요청 전송, 풀에서 연결 얻기
+CONNECT_TIMEOUT = 3.0
+STREAM_READ_TIMEOUT = 20.0
+WRITE_TIMEOUT = 10.0
+POOL_TIMEOUT = 2.0
+HTTP_TIMEOUT = openai.Timeout(STREAM_READ_TIMEOUT, connect=CONNECT_TIMEOUT, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT)
+
+# 재시도: 지수 백오프 상한까지 전체 지터 (sleep = uniform(0, min(cap, base * 2^attempt)))
+RETRY_BASE_SECONDS = 0.25
+RETRY_CAP_SECONDS = 4.0
+RETRYABLE_STATUS = (408, 409, 429)
+
+# 헤지 요청: 호출 지점별 최근 지연 시간 p95 를 넘기면 같은 요청을 한 번 더 보내 먼저 끝난 응답 사용
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# 서킷 브레이커: 연속 실패 횟수 임계값과 열린 상태 유지 시간(초)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+
+class CircuitOpenError(Exception):
+    """서킷 브레이커가 열려 있어 요청을 보내지 않음"""
+
+
+class CircuitBreaker:
+    """연속 실패가 임계값에 이르면 reset_seconds 동안 요청을 차단하는 서킷 브레이커
+
+    closed(정상) → open(차단) → half_open(시험 요청 하나만 허용) 순으로 전이하며,
+    시험 요청이 성공하면 closed, 실패하면 다시 open 이 된다.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """요청을 보내도 되는지 (열린 지 reset_seconds 가 지났으면 시험 요청 하나 허용)"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opens += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+
+
+def is_transient(error: Exception) -> bool:
+    """재시도할 만한 일시적 오류인지 (연결 실패/타임아웃, 429, 5xx 등)"""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError,
+                          httpx.TransportError, TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def request_timeout(remaining: float, read: Optional[float] = None) -> openai.Timeout:
+    """남은 마감 시간을 넘지 않는 요청별 타임아웃
+
+    read 를 주지 않으면 응답 전체를 남은 시간까지 기다리고, 주면(스트리밍) 읽기 타임아웃은 read 그대로다.
+    스트리밍 읽기 타임아웃은 조각마다 적용되므로 마감 시간으로 줄이면 첫 조각 이후의 조각까지 묶인다.
+    """
+    remaining = max(remaining, 0.01)
+    return openai.Timeout(
+        read if read else remaining, connect=min(CONNECT_TIMEOUT, remaining),
+        write=min(WRITE_TIMEOUT, remaining), pool=min(POOL_TIMEOUT, remaining)
+    )
+
+
+def backoff_delay(attempt: int) -> float:
+    """attempt 번째 재시도 전 대기 시간 (전체 지터)"""
+    return random.uniform(0.0, min(RETRY_CAP_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt)))
+
+
+class LLMClient:
+    """OpenAI 채팅 완성 공통 클라이언트
+
+    RAGEngine 과 ChatSummarizer 가 같은 연결 풀을 공유한다 (get_llm_client).
+    모든 호출은 전체 마감 시간(deadline) 안에서 일시적 오류를 지수 백오프 + 지터로 재시도하며,
+    SDK 자체 재시도는 끈다. 일반 호출은 hedge=True 이면 같은 호출 지점(call_site, 없으면 모델과 max_tokens)의
+    최근 지연 시간 p95 를 넘긴 요청에 같은 요청을 하나 더 보내 먼저 끝난 응답을 쓴다 (스트리밍은 헤지하지 않음).
+    응답 길이가 다른 호출(채팅 응답, 요약, 보고서)의 지연 시간이 섞이지 않도록 창을 따로 둔다.
+    재시도까지 실패한 일시적 오류가 이어지면 서킷 브레이커가 열려 한동안 CircuitOpenError 로 즉시 실패한다.
+    """
+
+    def __init__(self, api_key: str, max_retries: int = 3, deadline: float = 30.0, hedge: bool = True,
+                 max_workers: int = 8):
+        self.client = openai.OpenAI(
+            api_key=api_key, max_retries=0, timeout=HTTP_TIMEOUT,
+            http_client=openai.DefaultHttpxClient(limits=POOL_LIMITS, timeout=HTTP_TIMEOUT)
+        )
+        self.async_client = openai.AsyncOpenAI(
+            api_key=api_key, max_retries=0, timeout=HTTP_TIMEOUT,
+            http_client=openai.DefaultAsyncHttpxClient(limits=POOL_LIMITS, timeout=HTTP_TIMEOUT)
+        )
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.hedge = hedge
+        # 호출 지점별 최근 지연 시간(초)
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self.breaker = CircuitBreaker()
+        self._stats = {'requests': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'failures': 0, 'rejected': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats, breaker_state=self.breaker.state, breaker_opens=self.breaker.opens)
+            windows = {str(site): sorted(window) for site, window in self._latencies.items()}
+        stats['latency_ms'] = {
+            site: {'p50': latencies[len(latencies) // 2] * 1000,
+                   'p95': latencies[int(len(latencies) * HEDGE_QUANTILE)] * 1000}
+            for site, latencies in windows.items() if latencies
+        }
+        return stats
+
+    def _admit(self):
+        """서킷 브레이커 확인 후 요청 수 집계 (열려 있으면 CircuitOpenError)"""
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError("LLM 서킷 브레이커가 열려 있습니다")
+        self._count('requests')
+
+    def _give_up(self, error: Exception):
+        """재시도를 포기한 오류 기록 (일시적 오류만 브레이커 실패로 셈, 그 밖의 오류는 서버가 응답한 것)"""
+        self._count('failures')
+        if is_transient(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def record_stream_error(self, error: Exception):
+        """스트림을 연 뒤 조각을 읽다 난 오류 기록 (조각 사이 읽기 타임아웃 등)"""
+        self._give_up(error)
+
+    def _hedge_after(self, site) -> Optional[float]:
+        """site 호출 지점에서 헤지 요청을 보낼 대기 시간(초), 표본이 부족하면 None"""
+        with self._lock:
+            window = self._latencies.get(site)
+            if window is None or len(window) < HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(window)
+        return latencies[int(len(latencies) * HEDGE_QUANTILE)]
+
+    def _create(self, params: Dict, timeout: float, site):
+        start = time.monotonic()
+        response = self.client.chat.completions.create(timeout=request_timeout(timeout), **params)
+        with self._lock:
+            window = self._latencies.get(site)
+            if window is None:
+                window = self._latencies[site] = deque(maxlen=LATENCY_WINDOW)
+            window.append(time.monotonic() - start)
+        return response
+
+    def _create_hedged(self, params: Dict, end: float, hedge: bool, site):
+        """요청 한 번 (site 의 p95 를 넘기면 헤지 요청 추가), 먼저 성공한 응답 반환"""
+        hedge_after = self._hedge_after(site) if hedge else None
+        remaining = end - time.monotonic()
+        if hedge_after is None or hedge_after >= remaining:
+            return self._create(params, remaining, site)
+
+        primary = self._executor.submit(self._create, params, remaining, site)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        self._count('hedges')
+        secondary = self._executor.submit(self._create, params, end - time.monotonic(), site)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(end - time.monotonic(), 0.0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error or TimeoutError("LLM 요청 마감 시간 초과")
+
+    def complete(self, messages: List[Dict], model: str = DEFAULT_MODEL, deadline: Optional[float] = None,
+                 hedge: Optional[bool] = None, call_site: Optional[str] = None, **params):
+        """채팅 완성 (마감 시간 안에서 재시도/헤지)
+
+        call_site 는 헤지 기준 지연 시간 창의 이름이다 (없으면 모델과 max_tokens 로 구분).
+        """
+        end = time.monotonic() + (deadline or self.deadline)
+        hedge = self.hedge if hedge is None else hedge
+        site = call_site or (model, params.get('max_tokens'))
+        params = dict(params, model=model, messages=messages)
+        self._admit()
+        attempt = 0
+        while True:
+            try:
+                response = self._create_hedged(params, end, hedge, site)
+                self.breaker.record_success()
+                return response
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                if not is_transient(e) or attempt >= self.max_retries or time.monotonic() + delay >= end:
+                    self._give_up(e)
+                    raise
+                self._count('retries')
+                attempt += 1
+                time.sleep(delay)
+
+    def stream(self, messages: List[Dict], model: str = DEFAULT_MODEL, deadline: Optional[float] = None,
+               **params):
+        """스트리밍 채팅 완성
+
+        deadline 은 스트림을 여는 단계(연결과 재시도)에만 적용하고, 조각 사이 대기는 STREAM_READ_TIMEOUT 이다.
+        첫 조각까지의 시간 예산은 호출하는 쪽에서 적용한다 (RAGEngine).
+        """
+        end = time.monotonic() + (deadline or self.deadline)
+        self._admit()
+        attempt = 0
+        while True:
+            try:
+                stream = self.client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    timeout=request_timeout(end - time.monotonic(), STREAM_READ_TIMEOUT), **params
+                )
+                self.breaker.record_success()
+                return stream
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                if not is_transient(e) or attempt >= self.max_retries or time.monotonic() + delay >= end:
+                    self._give_up(e)
+                    raise
+                self._count('retries')
+                attempt += 1
+                time.sleep(delay)
+
+    async def astream(self, messages: List[Dict], model: str = DEFAULT_MODEL, deadline: Optional[float] = None,
+                      **params):
+        """stream 의 비동기 버전 (AsyncOpenAI)
+
+        호출하는 쪽의 시간 예산(asyncio.wait_for)으로 열기 도중 취소되면 시간 초과 실패로 기록한다
+        (기록하지 않으면 half_open 시험 요청이 끝나지 않아 브레이커가 계속 요청을 막음).
+        """
+        end = time.monotonic() + (deadline or self.deadline)
+        self._admit()
+        attempt = 0
+        while True:
+            try:
+                stream = await self.async_client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    timeout=request_timeout(end - time.monotonic(), STREAM_READ_TIMEOUT), **params
+                )
+                self.breaker.record_success()
+                return stream
+            except asyncio.CancelledError:
+                self._give_up(TimeoutError("스트림 열기 시간 예산 초과"))
+                raise
+            except Exception as e:
+                delay = backoff_delay(attempt)
+                if not is_transient(e) or attempt >= self.max_retries or time.monotonic() + delay >= end:
+                    self._give_up(e)
+                    raise
+                self._count('retries')
+                attempt += 1
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self._give_up(TimeoutError("스트림 열기 시간 예산 초과"))
+                    raise
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(api_key: str) -> LLMClient:
+    """API 키별 공유 LLMClient (프로세스당 하나의 연결 풀)"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = LLMClient(api_key)
+        return client
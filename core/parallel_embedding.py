@@ -0,0 +1,176 @@
+# core/parallel_embedding.py
+import os
+import json
+import time
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional
+import numpy as np
+
+STATE_FILE = "build_state.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+# 워커당 동시에 제출해 두는 샤드 수 (워커가 쉬지 않을 만큼만 앞서 보냄)
+SHARD_PREFETCH = 2
+
+# 워커 프로세스별 인코더 (initializer 에서 한 번만 로드)
+_worker_encoder = None
+
+
+def texts_fingerprint(texts: List[str]) -> str:
+    """코퍼스 입력 텍스트 전체 해시 (체크포인트 재사용 가능 여부 판단)"""
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _init_worker(model_name: str, backend: str, num_threads: int):
+    global _worker_encoder
+    from core.data_processor import DataProcessor
+    _, _worker_encoder = DataProcessor._load_encoder(model_name, backend, num_threads)
+
+
+def _encode_shard(shard_id: int, texts: List[str], batch_size: int) -> tuple:
+    start = time.perf_counter()
+    vectors = _worker_encoder.encode(texts, convert_to_numpy=True, show_progress_bar=False, batch_size=batch_size)
+    return shard_id, np.asarray(vectors, dtype=np.float32), time.perf_counter() - start
+
+
+def _shard_path(checkpoint_dir: str, shard_id: int) -> str:
+    return os.path.join(checkpoint_dir, f"shard_{shard_id:05d}.npy")
+
+
+def encode_corpus_parallel(texts: List[str], checkpoint_dir: str, model_name: str, backend: str,
+                           dimension: int, num_workers: Optional[int] = None, shard_size: int = 2048,
+                           batch_size: int = 32, embedding_cache=None,
+                           progress: Optional[Callable[[dict], None]] = None) -> np.ndarray:
+    """프로세스 풀로 코퍼스를 샤드 단위 인코딩, 완료된 샤드는 즉시 디스크에 기록
+
+    같은 checkpoint_dir 로 다시 실행하면 코퍼스/모델/샤드 크기가 같을 때 완료된 샤드는
+    건너뛰고 남은 샤드만 인코딩한다. 결과는 checkpoint_dir/embeddings.npy 메모리 매핑 배열로 반환한다.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    num_workers = num_workers or os.cpu_count() or 1
+    state = {
+        'model_name': model_name,
+        'backend': backend,
+        'num_rows': len(texts),
+        'shard_size': shard_size,
+        'fingerprint': texts_fingerprint(texts)
+    }
+
+    # 이전 실행 상태가 다르면 체크포인트 초기화
+    state_path = os.path.join(checkpoint_dir, STATE_FILE)
+    previous_state = None
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            previous_state = json.load(f)
+    if previous_state != state:
+        for name in os.listdir(checkpoint_dir):
+            if name.startswith('shard_'):
+                os.remove(os.path.join(checkpoint_dir, name))
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+
+    num_shards = (len(texts) + shard_size - 1) // shard_size
+    pending = []
+    done_rows = 0
+    for shard_id in range(num_shards):
+        shard_rows = min(shard_size, len(texts) - shard_id * shard_size)
+        path = _shard_path(checkpoint_dir, shard_id)
+        if os.path.exists(path) and np.load(path, mmap_mode='r').shape == (shard_rows, dimension):
+            done_rows += shard_rows
+        else:
+            pending.append(shard_id)
+    if done_rows:
+        print(f"체크포인트에서 재개: {num_shards - len(pending)}/{num_shards} 샤드 완료 ({done_rows}행)")
+
+    def write_shard(shard_id: int, vectors: np.ndarray):
+        tmp_path = _shard_path(checkpoint_dir, shard_id) + ".tmp.npy"
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, _shard_path(checkpoint_dir, shard_id))
+
+    start = time.perf_counter()
+    encoded_rows = 0
+
+    def report(shard_id: int, rows: int):
+        nonlocal done_rows, encoded_rows
+        done_rows += rows
+        encoded_rows += rows
+        elapsed = time.perf_counter() - start
+        info = {
+            'shard': shard_id,
+            'completed_shards': num_shards - len(remaining),
+            'num_shards': num_shards,
+            'done_rows': done_rows,
+            'num_rows': len(texts),
+            'rows_per_sec': encoded_rows / elapsed if elapsed > 0 else 0.0
+        }
+        if progress:
+            progress(info)
+        else:
+            print(f"[{info['completed_shards']}/{num_shards}] {done_rows}/{len(texts)}행, "
+                  f"{info['rows_per_sec']:.1f}행/초")
+
+    def finish(shard_id: int, shard_texts: List[str], vectors: Optional[np.ndarray], missing: List[int],
+               encoded: np.ndarray):
+        if vectors is None:
+            vectors = encoded
+        else:
+            vectors[missing] = encoded
+        write_shard(shard_id, vectors)
+        if embedding_cache is not None:
+            embedding_cache.put_many([shard_texts[i] for i in missing], encoded)
+        remaining.discard(shard_id)
+        report(shard_id, len(shard_texts))
+
+    # 샤드 버퍼는 제출할 때 만들고, 처리 중인 샤드는 워커 수 x SHARD_PREFETCH 개로 제한해
+    # 메모리에 코퍼스 전체 행렬이 아니라 처리 중인 샤드만 올라가도록 함
+    remaining = set(pending)
+    jobs = {}
+    executor = None
+    try:
+        for shard_id in pending:
+            shard_texts = texts[shard_id * shard_size:(shard_id + 1) * shard_size]
+            # 임베딩 캐시로 채울 수 있는 부분은 워커에 보내지 않음
+            if embedding_cache is not None:
+                vectors, missing = embedding_cache.lookup(shard_texts)
+            else:
+                vectors, missing = None, list(range(len(shard_texts)))
+            if not missing:
+                write_shard(shard_id, vectors)
+                remaining.discard(shard_id)
+                report(shard_id, len(shard_texts))
+                continue
+
+            if executor is None:
+                workers = min(num_workers, len(remaining))
+                executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(model_name, backend, max(1, (os.cpu_count() or 1) // num_workers))
+                )
+                max_in_flight = workers * SHARD_PREFETCH
+            while len(jobs) >= max_in_flight:
+                done, _ = wait(jobs, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(*jobs.pop(future), future.result()[1])
+            future = executor.submit(_encode_shard, shard_id, [shard_texts[i] for i in missing], batch_size)
+            jobs[future] = (shard_id, shard_texts, vectors, missing)
+
+        for future in as_completed(list(jobs)):
+            finish(*jobs.pop(future), future.result()[1])
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    # 샤드를 하나의 메모리 매핑 배열로 합침
+    output = np.lib.format.open_memmap(
+        os.path.join(checkpoint_dir, EMBEDDINGS_FILE), mode='w+', dtype=np.float32, shape=(len(texts), dimension)
+    )
+    for shard_id in range(num_shards):
+        output[shard_id * shard_size:(shard_id + 1) * shard_size] = np.load(_shard_path(checkpoint_dir, shard_id))
+    output.flush()
+    return np.load(os.path.join(checkpoint_dir, EMBEDDINGS_FILE), mmap_mode='r')
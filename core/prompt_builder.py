@@ -0,0 +1,179 @@
+# core/prompt_builder.py
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 고정 시스템 지침 (매 요청 바이트 단위로 동일해야 제공자 측 접두사 캐시가 적중함, 가변 내용을 넣지 말 것)
+SYSTEM_PROMPT = """당신은 10년 이상의 경력을 가진 전문 심리 상담사입니다.
+내담자의 이야기에 깊이 있게 귀 기울이고, 그들의 감정을 섬세하게 이해하며,
+적절한 시점에 통찰력 있는 질문과 반영을 제공합니다.
+
+전반적인 상담 원칙:
+1. 경청과 공감을 최우선으로 합니다
+2. 내담자의 페이스에 맞춰 대화를 진행합니다
+3. 한 번에 한 가지 주제만 깊이 있게 다룹니다
+4. 판단이나 평가는 절대 하지 않습니다
+
+인사 규칙:
+1. 첫 인사:
+- "안녕" 또는 "안녕하세요" 입력 시 반드시:
+"안녕하세요! AI 심리 상담 챗봇 공감엔진입니다. 편안한 마음으로 이야기를 시작해주세요."
+2. 마지막 인사:
+- 다른 형식 사용: "함께 이야기 나눌 수 있어 좋았습니다. 언제든 도움이 필요하시다면 다시 찾아주세요. 응원하겠습니다. 😊"
+
+대화 패턴:
+1. 싱글턴 응답:
+- 2-3문장으로 간결하게 응답
+- 즉각적인 감정 인식과 공감
+- 구체적이고 직접적인 질문
+- 위기 상황 시 즉시 대응:
+* 공감적 응답
+* 전문가 연계 정보
+* 가까운 상담센터 자동 표시
+* 구체적 행동 지침
+
+2. 멀티턴 응답:
+- 최대 4-5문장까지 허용
+- 단계적 문제 탐색:
+* 초기: 개방형 질문으로 상황 파악
+* 중기: 구체적 상황과 감정 탐색
+* 후기: 해결책 모색과 실천 방안 논의
+- 이전 대화 내용 참조
+- 감정 변화 추적 및 언급
+
+위기 상황 대응 형식:
+🚨 전문가의 도움이 필요해 보입니다.
+
+긴급 연락처:
+📞 자살예방상담전화: 1393
+📞 정신건강상담전화: 1577-0199
+
+📍 가까운 상담센터:
+[위치 기반 상담센터 정보 자동 표시]
+
+대화 기법:
+1. 감정 반영:
+- "~하셔서 많이 힘드셨겠네요"
+- "그런 상황에서 그렇게 느끼시는 게 당연합니다"
+
+2. 개방형 질문:
+- "어떤 점에서 그렇게 느끼시나요?"
+- "구체적으로 어떤 상황이었나요?"
+- "그동안 어떻게 대처해 오셨나요?"
+
+주의사항:
+1. 응답 길이 엄격 관리
+2. 이모티콘은 첫/마지막 인사와 좋은일, 기쁜일, 위로 필요시에만 사용
+3. 위기 상황 시 정해진 형식으로 즉시 대응
+4. 감정 변화를 항상 추적하고 언급
+5. 상담센터 정보는 위기 상황 시 자동 포함
+
+대화 끝의 '참고할 상담 사례'를 참고하되, 현재 대화 맥락과 단계를 고려하여
+싱글턴/멀티턴 상황에 맞는 적절한 응답을 제공하세요.
+응답은 지정된 길이를 반드시 준수하고, 위기 상황 시 정해진 형식을 반드시 따르세요."""
+
+CONTEXT_HEADER = "참고할 상담 사례:\n다음은 유사한 상담 사례들입니다:\n\n"
+SUMMARY_HEADER = "이전 대화 요약:\n"
+
+# 메시지당 역할/구분자 토큰
+MESSAGE_OVERHEAD_TOKENS = 4
+# 한글·한자·가나는 글자당 약 1토큰, 그 밖의 글자는 약 4자당 1토큰으로 추정 (gpt-4o 계열 기준, 보수적)
+_WIDE_CHARS = re.compile(r"[\u1100-\u11ff\u3040-\u30ff\u3130-\u318f\u4e00-\u9fff\uac00-\ud7af]")
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 빠르게 토큰 수 추정"""
+    wide = len(_WIDE_CHARS.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """추정 토큰 수가 max_tokens 이하가 되도록 앞(또는 뒤)부분만 남김"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 추정치는 글자 수에 대해 단조 증가하므로 이분 탐색으로 남길 글자 수를 찾음
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        part = text[-middle:] if keep_tail else text[:middle]
+        if estimate_tokens(part) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return "…" + text[len(text) - low:] if keep_tail else text[:low] + "…"
+
+
+class PromptBuilder:
+    """접두사 캐시 친화적 프롬프트 조립
+
+    메시지 순서는 [고정 시스템 지침] + [이전 대화 요약] + [최근 대화] + [참고 사례] + [현재 질문] 이다.
+    고정 지침은 한 번만 만들어 두고 매 요청 같은 객체를 쓰므로 항상 같은 바이트로 시작한다.
+    참고 사례는 사례별 max_case_tokens, 전체 max_context_tokens 안에서 자르고,
+    최근 대화는 남은 예산 안에서 최신 메시지부터 채운다.
+    """
+
+    def __init__(self, max_prompt_tokens: int = 3000, max_context_tokens: int = 900,
+                 max_case_tokens: int = 400, max_history_messages: int = 4,
+                 system_prompt: str = SYSTEM_PROMPT):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_context_tokens = max_context_tokens
+        self.max_case_tokens = max_case_tokens
+        self.max_history_messages = max_history_messages
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.system_tokens = estimate_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+
+    def format_case(self, number: int, case: Dict) -> str:
+        """사례 하나를 사례별 토큰 예산 안에서 서식화 (대화 내용은 뒷부분, 상담사 답변은 앞부분 유지)"""
+        half = self.max_case_tokens // 2
+        if case.get('type') == 'multi':  # 멀티턴 대화인 경우
+            dialog = truncate_to_tokens(case['input'], half, keep_tail=True)
+            answer = truncate_to_tokens(case['output'], self.max_case_tokens - estimate_tokens(dialog))
+            return f"사례 {number}:\n대화 내용:\n{dialog}\n상담사 답변:\n{answer}\n\n"
+        # 싱글턴 대화인 경우
+        client = truncate_to_tokens(case['input'], half)
+        answer = truncate_to_tokens(case['output'], self.max_case_tokens - estimate_tokens(client))
+        return f"사례 {number}:\n내담자: {client}\n상담사: {answer}\n\n"
+
+    def format_cases(self, cases: List[Dict]) -> Tuple[str, int]:
+        """참고 사례 컨텍스트와 포함된 사례 수 (전체 예산을 넘는 사례부터 제외)"""
+        context = CONTEXT_HEADER
+        used = 0
+        for case in cases:
+            part = self.format_case(used + 1, case)
+            if used and estimate_tokens(context + part) > self.max_context_tokens:
+                break
+            context += part
+            used += 1
+        return context, used
+
+    def build(self, query: str, cases: List[Dict], chat_history: List[Dict], summary: Optional[str] = None,
+              max_history: Optional[int] = None) -> Tuple[List[Dict], Dict]:
+        """(메시지 목록, 정보) 반환
+
+        정보: estimated_tokens, cases(포함된 사례 수), history_messages(포함된 대화 수).
+        summary 는 오래된 대화의 누적 요약(SessionMemory), max_history 는 최근 대화 개수 상한
+        (기본: max_history_messages)이다. chat_history 의 마지막 메시지가 현재 질문이면 중복으로 보내지 않는다.
+        """
+        context, used_cases = self.format_cases(cases)
+        context_message = {"role": "system", "content": context}
+        query_message = {"role": "user", "content": query}
+        tokens = self.system_tokens + estimate_tokens(context) + estimate_tokens(query) + 2 * MESSAGE_OVERHEAD_TOKENS
+        head = [self.system_message]
+        if summary:
+            head.append({"role": "system", "content": SUMMARY_HEADER + summary})
+            tokens += estimate_tokens(head[-1]['content']) + MESSAGE_OVERHEAD_TOKENS
+
+        if chat_history and chat_history[-1]['role'] == "user" and chat_history[-1]['content'] == query:
+            chat_history = chat_history[:-1]
+        # 최신 메시지부터 예산 안에서 채움 (역할/내용만 전달)
+        limit = self.max_history_messages if max_history is None else max_history
+        history = []
+        for message in reversed(chat_history[-limit:] if limit else []):
+            cost = estimate_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS
+            if tokens + cost > self.max_prompt_tokens:
+                break
+            history.append({"role": message['role'], "content": message['content']})
+            tokens += cost
+        history.reverse()
+
+        messages = head + history + [context_message, query_message]
+        return messages, {'estimated_tokens': tokens, 'cases': used_cases, 'history_messages': len(history)}
@@ -1,184 +1,238 @@
 # core/rag_engine.py
-from typing import List, Dict
+import time
+import asyncio
+import threading
+from typing import Callable, List, Dict, Iterator, AsyncIterator, Optional
 from core.data_processor import DataProcessor
-from openai import OpenAI
+from core.prompt_builder import PromptBuilder
+from core.session_memory import SessionMemory
+from core.llm_client import CircuitOpenError, get_llm_client
+from core.degraded_responder import DegradedResponder
+
+# 응답 생성 파라미터 (일반/스트리밍 공통)
+COMPLETION_PARAMS = {
+    'temperature': 0.3,
+    'max_tokens': 500,  # 짧은 응답 유도
+    'top_p': 0.9,
+    'frequency_penalty': 0.7,  # 반복 줄이기
+    'presence_penalty': 0.7    # 새로운 주제 도입 억제
+}
+
+# 시간 예산(초): 일반 응답 전체, 스트리밍은 첫 내용 조각까지. 넘기면 대체 응답 사용
+# (첫 조각 이후 조각 사이 대기는 llm_client.STREAM_READ_TIMEOUT)
+RESPONSE_BUDGET_SECONDS = 8.0
+FIRST_TOKEN_BUDGET_SECONDS = 4.0
+INTERRUPTED_NOTICE = "\n\n(응답이 중간에 끊겼습니다. 다시 한 번 말씀해 주시겠어요?)"
+
+
+def fallback_reason(error: Exception) -> str:
+    """대체 응답 사유: circuit_open(브레이커 차단), budget(시간 예산 초과), error(그 밖의 오류)"""
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, TimeoutError) or 'timeout' in type(error).__name__.lower():
+        return 'budget'
+    return 'error'
 
 class RAGEngine:
-    def __init__(self, data_processor: DataProcessor, openai_api_key: str):
+    def __init__(self, data_processor: DataProcessor, openai_api_key: str,
+                 crisis_detector: Optional[Callable[[str], bool]] = None):
         self.data_processor = data_processor
-        self.client = OpenAI(api_key=openai_api_key)
+        # 공유 OpenAI 클라이언트 (연결 풀, 마감 시간, 재시도/헤지 요청, 서킷 브레이커)
+        self.llm = get_llm_client(openai_api_key)
+        # LLM 장애/지연 시 유사 사례 기반 대체 응답 (crisis_detector 를 주면 긴급 연락처 포함)
+        self.degraded = DegradedResponder(data_processor, crisis_detector)
+        # 마지막 스트리밍 응답의 단계별 시간(ms): prompt_ms, first_token_ms, total_ms
+        self.last_stream_timings = {}
+        # 고정 지침 + 최근 대화 + 유사 사례 + 질문 순서로 조립 (토큰 예산 적용)
+        self.prompt_builder = PromptBuilder()
+        # 추정/실제 프롬프트 토큰과 접두사 캐시 적중 토큰 누적
+        self.prompt_stats = {'requests': 0, 'estimated_tokens': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
+        self._stats_lock = threading.Lock()
         
+    def retrieve_cases(self, query: str) -> List[Dict]:
+        """프롬프트에 넣을 유사 상담 사례 검색"""
+        return self.data_processor.find_similar_cases(
+            query, k=2, hybrid=True, rerank=True, diversity=0.7
+        )  # 유사 사례 수 조정 (밀집 + BM25, 재정렬이 켜져 있으면 교차 인코더 재정렬, MMR 로 중복 사례 제외)
+
     def generate_context(self, query: str) -> str:
-        """유사 상담 사례를 기반으로 컨텍스트 생성"""
-        similar_cases = self.data_processor.find_similar_cases(query, k=2)  # 유사 사례 수 조정
-        
-        context = "다음은 유사한 상담 사례들입니다:\n\n"
-        for i, case in enumerate(similar_cases, 1):
-            context += f"사례 {i}:\n"
-            if case.get('type') == 'multi':  # 멀티턴 대화인 경우
-                context += f"대화 내용:\n{case['input']}\n상담사 답변:\n{case['output']}\n\n"
-            else:  # 싱글턴 대화인 경우
-                context += f"내담자: {case['input']}\n상담사: {case['output']}\n\n"
-            
-        return context
+        """유사 상담 사례를 기반으로 컨텍스트 생성 (사례별/전체 토큰 예산 적용)"""
+        return self.prompt_builder.format_cases(self.retrieve_cases(query))[0]
     
-    def get_response(self, query: str, chat_history: List[Dict]) -> str:
-        """RAG 기반 응답 생성"""
+    def _build_messages(self, query: str, chat_history: List[Dict], cases: Optional[List[Dict]] = None,
+                        memory: Optional[SessionMemory] = None) -> List[Dict]:
+        """고정 지침, 최근 대화, 유사 사례, 현재 질문으로 메시지 목록 구성 (PromptBuilder)
+
+        cases 를 주면(미리 검색한 경우) 다시 검색하지 않는다.
+        memory 를 주면 최근 4개 메시지 대신 [누적 요약] + [요약되지 않은 최근 대화]를 넣는다.
+        """
+        if cases is None:
+            cases = self.retrieve_cases(query)
+        if memory is not None:
+            summary, recent = memory.context(chat_history)
+            messages, info = self.prompt_builder.build(query, cases, recent, summary, memory.max_recent_messages)
+        else:
+            messages, info = self.prompt_builder.build(query, cases, chat_history)
+        with self._stats_lock:
+            self.prompt_stats['requests'] += 1
+            self.prompt_stats['estimated_tokens'] += info['estimated_tokens']
+        return messages
+
+    def _record_usage(self, usage):
+        """응답 사용량의 프롬프트 토큰과 접두사 캐시 적중 토큰 누적"""
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        with self._stats_lock:
+            self.prompt_stats['prompt_tokens'] += usage.prompt_tokens or 0
+            self.prompt_stats['cached_tokens'] += (getattr(details, 'cached_tokens', None) or 0) if details else 0
+
+    def get_prompt_stats(self) -> Dict:
+        """프롬프트 크기와 접두사 캐시 적중 통계"""
+        with self._stats_lock:
+            stats = dict(self.prompt_stats)
+        stats['cached_ratio'] = stats['cached_tokens'] / stats['prompt_tokens'] if stats['prompt_tokens'] else 0.0
+        return stats
+
+    def get_response(self, query: str, chat_history: List[Dict], memory: Optional[SessionMemory] = None) -> str:
+        """RAG 기반 응답 생성 (실패/시간 예산 초과/브레이커 차단 시 대체 응답)"""
+        cases = None
         try:
-            # 컨텍스트 생성
-            context = self.generate_context(query)
-            # 히스토리 길이로 대화 단계 파악
-            is_initial = len(chat_history) <= 2
-
-            system_prompt = """당신은 10년 이상의 경력을 가진 전문 심리 상담사입니다.
-    내담자의 이야기에 깊이 있게 귀 기울이고, 그들의 감정을 섬세하게 이해하며,
-    적절한 시점에 통찰력 있는 질문과 반영을 제공합니다.
-
-    전반적인 상담 원칙:
-    1. 경청과 공감을 최우선으로 합니다
-    2. 내담자의 페이스에 맞춰 대화를 진행합니다
-    3. 한 번에 한 가지 주제만 깊이 있게 다룹니다
-    4. 판단이나 평가는 절대 하지 않습니다
-
-    인사 규칙:
-    1. 첫 인사:
-    - "안녕" 또는 "안녕하세요" 입력 시 반드시:
-    "안녕하세요! AI 심리 상담 챗봇 공감엔진입니다. 편안한 마음으로 이야기를 시작해주세요."
-    2. 마지막 인사:
-    - 다른 형식 사용: "함께 이야기 나눌 수 있어 좋았습니다. 언제든 도움이 필요하시다면 다시 찾아주세요. 응원하겠습니다. 😊"
-
-    대화 패턴:
-    1. 싱글턴 응답:
-    - 2-3문장으로 간결하게 응답
-    - 즉각적인 감정 인식과 공감
-    - 구체적이고 직접적인 질문
-    - 위기 상황 시 즉시 대응:
-    * 공감적 응답
-    * 전문가 연계 정보
-    * 가까운 상담센터 자동 표시
-    * 구체적 행동 지침
-
-    2. 멀티턴 응답:
-    - 최대 4-5문장까지 허용
-    - 단계적 문제 탐색:
-    * 초기: 개방형 질문으로 상황 파악
-    * 중기: 구체적 상황과 감정 탐색
-    * 후기: 해결책 모색과 실천 방안 논의
-    - 이전 대화 내용 참조
-    - 감정 변화 추적 및 언급
-
-    위기 상황 대응 형식:
-    🚨 전문가의 도움이 필요해 보입니다.
-
-    긴급 연락처:
-    📞 자살예방상담전화: 1393
-    📞 정신건강상담전화: 1577-0199
-
-    📍 가까운 상담센터:
-    [위치 기반 상담센터 정보 자동 표시]
-
-    대화 기법:
-    1. 감정 반영:
-    - "~하셔서 많이 힘드셨겠네요"
-    - "그런 상황에서 그렇게 느끼시는 게 당연합니다"
-
-    2. 개방형 질문:
-    - "어떤 점에서 그렇게 느끼시나요?"
-    - "구체적으로 어떤 상황이었나요?"
-    - "그동안 어떻게 대처해 오셨나요?"
-
-    주의사항:
-    1. 응답 길이 엄격 관리
-    2. 이모티콘은 첫/마지막 인사와 좋은일, 기쁜일, 위로 필요시에만 사용
-    3. 위기 상황 시 정해진 형식으로 즉시 대응
-    4. 감정 변화를 항상 추적하고 언급
-    5. 상담센터 정보는 위기 상황 시 자동 포함
-
-    참고할 상담 사례:
-    {context}
-
-    현재 대화 맥락과 단계를 고려하여, 싱글턴/멀티턴 상황에 맞는 적절한 응답을 제공하세요.
-    응답은 지정된 길이를 반드시 준수하고, 위기 상황 시 정해진 형식을 반드시 따르세요.
-    """
-            
-            # 메시지 구성
-            messages = [
-                {"role": "system", "content": system_prompt.format(context=context)}
-            ]
-            
-            # 대화 히스토리 추가 (최근 4개 메시지만)
-            recent_history = chat_history[-4:] if len(chat_history) > 4 else chat_history
-            messages.extend(recent_history)
-            
-            # 현재 질문 추가
-            messages.append({"role": "user", "content": query})
-            
+            cases = self.retrieve_cases(query)
+            messages = self._build_messages(query, chat_history, cases, memory)
+
             # GPT 응답 생성
-            response = self.client.chat.completions.create(
+            response = self.llm.complete(
+                messages,
                 model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=500,  # 짧은 응답 유도
-                top_p=0.9,
-                frequency_penalty=0.7,  # 반복 줄이기
-                presence_penalty=0.7    # 새로운 주제 도입 억제
+                deadline=RESPONSE_BUDGET_SECONDS,
+                call_site="chat",
+                **COMPLETION_PARAMS
             )
+            self._record_usage(response.usage)
             
             return response.choices[0].message.content
             
         except Exception as e:
-            return f"😥 죄송합니다. 오류가 발생했습니다: {str(e)}"
-            
-            # 메시지 구성
-            messages = [
-                {"role": "system", "content": system_prompt.format(context=context)}
-            ]
-            
-            # 대화 히스토리 추가 (최근 4개 메시지만)
-            recent_history = chat_history[-4:] if len(chat_history) > 4 else chat_history
-            messages.extend(recent_history)
-            
-            # 현재 질문 추가
-            messages.append({"role": "user", "content": query})
-            
-            # GPT 응답 생성
-            response = self.client.chat.completions.create(
+            return self.degraded.respond(query, fallback_reason(e), cases)
+
+    def stream_response(self, query: str, chat_history: List[Dict],
+                        memory: Optional[SessionMemory] = None) -> Iterator[str]:
+        """RAG 기반 응답을 토큰 조각 단위로 생성 (스트리밍)
+
+        첫 조각까지의 시간과 전체 생성 시간은 last_stream_timings 에 기록한다.
+        첫 조각 전에 실패하거나 FIRST_TOKEN_BUDGET_SECONDS 를 넘기면 대체 응답을 내보내고
+        ('degraded' 에 사유 기록), 중간에 끊기면 그때까지의 조각 뒤에 안내 문구를 붙인다.
+        동기 스트림은 읽기 도중 끊을 수 없으므로 첫 내용 조각 전에 도착한 조각마다 예산을 확인한다.
+        """
+        start = time.perf_counter()
+        budget_end = time.monotonic() + FIRST_TOKEN_BUDGET_SECONDS
+        self.last_stream_timings = {}
+        stream = None
+        cases = None
+        started = False
+        try:
+            cases = self.retrieve_cases(query)
+            messages = self._build_messages(query, chat_history, cases, memory)
+            self.last_stream_timings['prompt_ms'] = (time.perf_counter() - start) * 1000
+
+            stream = self.llm.stream(
+                messages,
                 model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.3, 
-                max_tokens=500,   
-                top_p=0.9,
-                frequency_penalty=0.6,  
-                presence_penalty=0.6,   
+                deadline=FIRST_TOKEN_BUDGET_SECONDS,
+                stream_options={"include_usage": True},
+                **COMPLETION_PARAMS
             )
-            return response.choices[0].message.content
-            
+            for chunk in stream:
+                if not started and time.monotonic() > budget_end:
+                    raise TimeoutError("첫 응답 조각 시간 예산 초과")
+                if not chunk.choices:
+                    # 마지막 조각에만 사용량이 있음
+                    self._record_usage(chunk.usage)
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if not started:
+                        started = True
+                        self.last_stream_timings['first_token_ms'] = (time.perf_counter() - start) * 1000
+                    yield token
+
         except Exception as e:
-            return f"😥 죄송합니다. 오류가 발생했습니다: {str(e)}"
-            
-            # 메시지 구성
-            messages = [
-                {"role": "system", "content": system_prompt.format(context=context)}
-            ]
-            
-            # 대화 히스토리 추가 (최근 3개 메시지만)
-            recent_history = chat_history[-3:] if len(chat_history) > 3 else chat_history
-            messages.extend(recent_history)
-            
-            # 현재 질문 추가
-            messages.append({"role": "user", "content": query})
-            
-            # GPT 응답 생성
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  
-                messages=messages,
-                temperature=0.3,  
-                max_tokens=500,   
-                top_p=0.8,       
-                frequency_penalty=0.3,
-                presence_penalty=0.3,
+            if stream is not None:
+                self.llm.record_stream_error(e)
+            if started:
+                yield INTERRUPTED_NOTICE
+            else:
+                self.last_stream_timings['degraded'] = fallback_reason(e)
+                yield self.degraded.respond(query, self.last_stream_timings['degraded'], cases)
+        finally:
+            self.last_stream_timings['total_ms'] = (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    async def _aclose(stream):
+        """시간 예산을 넘겨 버리는 스트림의 연결 반환"""
+        try:
+            await stream.close()
+        except Exception as e:
+            print(f"스트림 종료 중 오류: {str(e)}")
+
+    async def astream_response(self, query: str, chat_history: List[Dict], cases: Optional[List[Dict]] = None,
+                               timings: Optional[Dict] = None,
+                               memory: Optional[SessionMemory] = None) -> AsyncIterator[str]:
+        """stream_response 의 비동기 버전 (AsyncOpenAI 사용)
+
+        cases 는 미리 검색한 유사 사례, timings 를 주면 first_token_ms/total_ms(대체 응답이면 degraded)를 기록한다.
+        스트림 열기와 첫 내용 조각 대기에만 FIRST_TOKEN_BUDGET_SECONDS 를 적용한다 (asyncio.wait_for).
+        """
+        start = time.perf_counter()
+        budget_end = time.monotonic() + FIRST_TOKEN_BUDGET_SECONDS
+        timings = timings if timings is not None else {}
+        stream = None
+        started = False
+        try:
+            if cases is None:
+                cases = await asyncio.to_thread(self.retrieve_cases, query)
+            messages = self._build_messages(query, chat_history, cases, memory)
+            stream = await asyncio.wait_for(
+                self.llm.astream(
+                    messages,
+                    model="gpt-4o-mini",
+                    deadline=FIRST_TOKEN_BUDGET_SECONDS,
+                    stream_options={"include_usage": True},
+                    **COMPLETION_PARAMS
+                ),
+                max(budget_end - time.monotonic(), 0.01)
             )
-            return response.choices[0].message.content
-            
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    if started:
+                        chunk = await chunks.__anext__()
+                    else:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(budget_end - time.monotonic(), 0.01))
+                except StopAsyncIteration:
+                    break
+                if not chunk.choices:
+                    self._record_usage(chunk.usage)
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if not started:
+                        started = True
+                        timings['first_token_ms'] = (time.perf_counter() - start) * 1000
+                    yield token
+
         except Exception as e:
-            return f"😥 죄송합니다. 오류가 발생했습니다: {str(e)}"
+            # 열기 단계의 오류와 예산 초과(wait_for 가 astream 을 취소)는 astream 이 브레이커에 기록한다
+            if stream is not None:
+                self.llm.record_stream_error(e)
+                if not started:
+                    await self._aclose(stream)
+            if started:
+                yield INTERRUPTED_NOTICE
+            else:
+                # 검색한 사례를 그대로 쓰고, 사례가 없어 다시 검색하더라도 이벤트 루프를 막지 않도록 스레드에서 실행
+                timings['degraded'] = fallback_reason(e)
+                yield await asyncio.to_thread(self.degraded.respond, query, timings['degraded'], cases)
+        finally:
+            timings['total_ms'] = (time.perf_counter() - start) * 1000
@@ -0,0 +1,129 @@
+# core/reranker.py
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Tuple
+import numpy as np
+
+DEFAULT_RERANKER_MODEL = "bongsoo/klue-cross-encoder-v1"
+
+
+def query_key(query: str) -> bytes:
+    """점수 캐시용 쿼리 해시"""
+    return hashlib.blake2b(query.strip().encode('utf-8'), digest_size=16).digest()
+
+
+class CrossEncoderReranker:
+    """교차 인코더 재정렬 단계
+
+    밀집 검색 후보 (쿼리, 사례 입력) 쌍을 한 번의 배치로 점수 매기고 점수 순으로 다시 정렬한다.
+    점수는 (쿼리 해시, 사례 번호) 단위 LRU 캐시에 보관한다. 점수 계산은 전용 스레드에서 수행하며
+    budget_ms 안에 끝나지 않거나 앞선 요청이 밀려 있으면 밀집 검색 순서를 그대로 반환한다
+    (늦게 끝난 점수도 캐시에 저장되어 같은 질문의 다음 요청에 사용된다).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, budget_ms: float = 150.0,
+                 batch_size: int = 32, max_length: int = 256, cache_size: int = 4096,
+                 max_pending: int = 2, model=None):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, max_length=max_length, device='cpu')
+        self.model = model
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.max_pending = max_pending
+        self._cache = OrderedDict()
+        self._cache_owner = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        self._stats = {'requests': 0, 'reranked': 0, 'fallbacks': 0, 'cache_hits': 0, 'scored_pairs': 0}
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, cache_entries=len(self._cache))
+
+    def _cached_scores(self, key: bytes, case_ids: List[int], owner) -> Dict[int, float]:
+        with self._lock:
+            # 코퍼스가 바뀌면 사례 번호의 의미가 달라지므로 캐시를 비움
+            if owner is not self._cache_owner:
+                self._cache.clear()
+                self._cache_owner = owner
+            scores = {}
+            for case_id in case_ids:
+                score = self._cache.get((key, case_id))
+                if score is not None:
+                    self._cache.move_to_end((key, case_id))
+                    scores[case_id] = score
+            return scores
+
+    def _score(self, key: bytes, query: str, pairs: List[Tuple[int, str]]) -> Dict[int, float]:
+        """교차 인코더 배치 점수 계산 후 캐시에 저장 (전용 스레드에서 실행)"""
+        try:
+            values = self.model.predict(
+                [(query, text) for _, text in pairs], batch_size=self.batch_size, show_progress_bar=False
+            )
+            scores = {case_id: float(value) for (case_id, _), value in zip(pairs, np.ravel(values))}
+            with self._lock:
+                for case_id, score in scores.items():
+                    self._cache[(key, case_id)] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self._stats['scored_pairs'] += len(scores)
+            return scores
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def rerank(self, query: str, candidates: List[Tuple[int, str]], k: int, owner=None) -> Tuple[List[int], Dict]:
+        """후보 [(사례 번호, 입력 텍스트)] 를 재정렬해 상위 k개 사례 번호와 처리 정보 반환
+
+        재정렬에 성공하면 처리 정보의 'scores' 에 반환 순서대로 교차 인코더 점수가 들어 있다.
+        owner 는 후보 번호가 가리키는 코퍼스 객체로, 바뀌면 점수 캐시를 비운다.
+        """
+        start = time.perf_counter()
+        case_ids = [case_id for case_id, _ in candidates]
+        key = query_key(query)
+        scores = self._cached_scores(key, case_ids, owner)
+        missing = [(case_id, text) for case_id, text in candidates if case_id not in scores]
+        info = {'cache_hits': len(scores), 'scored': len(missing), 'reranked': False, 'fallback': None}
+
+        if missing:
+            with self._lock:
+                busy = self._pending >= self.max_pending
+                if not busy:
+                    self._pending += 1
+            if busy:
+                info['fallback'] = 'busy'
+            else:
+                future = self._executor.submit(self._score, key, query, missing)
+                remaining = self.budget_ms / 1000.0 - (time.perf_counter() - start)
+                try:
+                    scores.update(future.result(timeout=max(remaining, 0.0)))
+                except FutureTimeoutError:
+                    info['fallback'] = 'budget'
+                except Exception as e:
+                    print(f"재정렬 점수 계산 중 오류: {str(e)}")
+                    info['fallback'] = 'error'
+
+        if info['fallback'] is None:
+            order = sorted(range(len(case_ids)), key=lambda position: -scores[case_ids[position]])
+            ranked = [case_ids[position] for position in order]
+            info['reranked'] = True
+            info['scores'] = [scores[case_id] for case_id in ranked[:k]]
+        else:
+            ranked = case_ids
+        info['elapsed_ms'] = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['cache_hits'] += info['cache_hits']
+            self._stats['reranked' if info['reranked'] else 'fallbacks'] += 1
+        return ranked[:k], info
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,90 @@
+# core/retrieval_cache.py
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+# 구두점/기호 제거 후 공백 정리
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """캐시 키용 쿼리 정규화: NFC, 소문자, 구두점 제거, 공백 접기
+
+    "우울해요.." 와 "우울해요" 처럼 표기만 다른 질문이 같은 키가 된다.
+    """
+    text = unicodedata.normalize('NFC', query).lower()
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class RetrievalCache:
+    """정규화 쿼리 기반 검색 결과 캐시 (LRU + TTL)
+
+    조회(get)의 인덱스 버전이 바뀌면 모든 항목을 버린다. 저장(put)의 버전이 현재 버전과 다르면
+    (검색 도중 인덱스가 바뀐 늦은 저장) 캐시를 비우지 않고 그 값만 버린다.
+    조회/적중/만료/축출/버린 저장 횟수를 기록한다.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0,
+                       'stale_puts': 0}
+
+    def _check_version(self, version: Hashable):
+        if version != self._version:
+            if self._entries:
+                self._stats['invalidations'] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Hashable, version: Hashable):
+        """캐시 값 조회 (없거나 만료되었거나 버전이 다르면 None)"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def put(self, key: Hashable, value, version: Hashable):
+        with self._lock:
+            if self._version is None:
+                self._version = version
+            elif version != self._version:
+                self._stats['stale_puts'] += 1
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                hit_rate=self._stats['hits'] / lookups if lookups else 0.0
+            )
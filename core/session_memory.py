@@ -0,0 +1,73 @@
+# core/session_memory.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+class SessionMemory:
+    """세션별 누적 요약 메모리
+
+    최근 keep_recent_turns 턴은 원문 그대로 두고, 그보다 오래된 대화가 update_every_turns 턴만큼
+    쌓이면 백그라운드에서 이전 요약과 합쳐 새 요약을 만든다. 프롬프트에는 [요약] + [요약되지 않은 최근 대화]
+    가 들어가므로 세션이 길어져도 턴당 프롬프트 크기가 일정 범위에 머문다.
+    요약이 끝나기 전이나 실패한 경우에는 요약되지 않은 대화를 그대로 사용한다.
+    """
+
+    _executor = None
+    _lock = threading.Lock()
+
+    def __init__(self, summarizer, update_every_turns: int = 3, keep_recent_turns: int = 2,
+                 max_summary_chars: int = 600):
+        self.summarizer = summarizer
+        self.update_every_turns = update_every_turns
+        self.keep_recent_turns = keep_recent_turns
+        self.max_summary_chars = max_summary_chars
+        self.summary = ""
+        # summary 가 chat_history[:summarized_upto] 를 요약함
+        self.summarized_upto = 0
+        self.updates = 0
+        self._pending = None
+        self._state_lock = threading.Lock()
+        with SessionMemory._lock:
+            if SessionMemory._executor is None:
+                SessionMemory._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory")
+
+    @property
+    def max_recent_messages(self) -> int:
+        """요약되지 않은 채 프롬프트에 들어갈 수 있는 최대 메시지 수"""
+        return 2 * (self.keep_recent_turns + self.update_every_turns)
+
+    def context(self, chat_history: List[Dict]) -> Tuple[Optional[str], List[Dict]]:
+        """(요약 또는 None, 요약되지 않은 최근 대화) 반환"""
+        with self._state_lock:
+            return self.summary or None, chat_history[self.summarized_upto:]
+
+    def maybe_update(self, chat_history: List[Dict]) -> bool:
+        """요약할 대화가 update_every_turns 턴 이상 쌓였으면 백그라운드 요약 시작 (시작했으면 True)"""
+        with self._state_lock:
+            if self._pending is not None and not self._pending.done():
+                return False
+            fold_end = len(chat_history) - 2 * self.keep_recent_turns
+            if fold_end - self.summarized_upto < 2 * self.update_every_turns:
+                return False
+            messages = [
+                {'role': message['role'], 'content': message['content']}
+                for message in chat_history[self.summarized_upto:fold_end]
+            ]
+            self._pending = self._executor.submit(self._update, self.summary, messages, fold_end)
+        return True
+
+    def _update(self, previous_summary: str, messages: List[Dict], fold_end: int):
+        summary = self.summarizer.update_summary(previous_summary, messages, self.max_summary_chars)
+        if not summary:
+            return
+        with self._state_lock:
+            self.summary = summary.strip()[:self.max_summary_chars]
+            self.summarized_upto = fold_end
+            self.updates += 1
+
+    def wait(self, timeout: Optional[float] = None):
+        """진행 중인 요약이 끝날 때까지 대기 (테스트/종료용)"""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
@@ -1,11 +1,15 @@
 # core/summarizer.py
-from openai import OpenAI
+from core.llm_client import get_llm_client
 import pandas as pd
 from datetime import datetime
 
+# 요약/보고서는 응답보다 길어 마감 시간을 넉넉하게 둠
+SUMMARY_DEADLINE_SECONDS = 60.0
+
 class ChatSummarizer:
     def __init__(self, api_key):
-        self.client = OpenAI(api_key=api_key)
+        # RAGEngine 과 같은 공유 클라이언트 (연결 풀, 재시도)
+        self.llm = get_llm_client(api_key)
 
     def generate_summary(self, conversation_history):
         """대화 내용 요약 생성"""
@@ -27,14 +31,16 @@ class ChatSummarizer:
             4. 상담 진행 상태:
             """
 
-            response = self.client.chat.completions.create(
+            response = self.llm.complete(
                 model="gpt-4o-mini",
+                deadline=SUMMARY_DEADLINE_SECONDS,
                 messages=[
                     {"role": "system", "content": "당신은 전문 심리 상담사입니다. 상담 내용을 전문적으로 요약해주세요."},
                     {"role": "user", "content": summary_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                call_site="summary"
             )
 
             return response.choices[0].message.content
@@ -42,6 +48,43 @@ class ChatSummarizer:
         except Exception as e:
             return f"요약 생성 중 오류 발생: {str(e)}"
 
+    def update_summary(self, previous_summary, new_messages, max_chars=600):
+        """이전 요약에 새 대화를 합친 누적 요약 생성 (실패 시 None)"""
+        try:
+            formatted_messages = "\n".join([
+                f"{msg['role']}: {msg['content']}"
+                for msg in new_messages
+            ])
+
+            update_prompt = f"""
+            지금까지의 상담 요약과 이어진 대화입니다. 둘을 합쳐 {max_chars}자 이내의 새 요약을 작성해주세요.
+            호소 문제, 감정 변화, 이미 다룬 내용과 내담자가 공유한 중요한 사실을 빠짐없이 남기고, 인사말은 생략해주세요.
+
+            이전 요약:
+            {previous_summary or "(없음)"}
+
+            이어진 대화:
+            {formatted_messages}
+            """
+
+            response = self.llm.complete(
+                model="gpt-4o-mini",
+                deadline=SUMMARY_DEADLINE_SECONDS,
+                messages=[
+                    {"role": "system", "content": "당신은 전문 심리 상담사입니다. 다음 응답에 참고할 수 있도록 상담 내용을 간결하게 누적 요약해주세요."},
+                    {"role": "user", "content": update_prompt}
+                ],
+                temperature=0.3,
+                max_tokens=400,
+                call_site="summary_update"
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            print(f"누적 요약 생성 중 오류 발생: {str(e)}")
+            return None
+
     def generate_session_report(self, session_data):
         """상담 세션 보고서 생성"""
         try:
@@ -65,14 +108,16 @@ class ChatSummarizer:
             6. 향후 권장 사항
             """
 
-            response = self.client.chat.completions.create(
+            response = self.llm.complete(
                 model="gpt-4o-mini",
+                deadline=SUMMARY_DEADLINE_SECONDS,
                 messages=[
                     {"role": "system", "content": "당신은 전문 심리 상담사입니다. 상담 세션에 대한 전문적인 보고서를 작성해주세요."},
                     {"role": "user", "content": report_prompt}
                 ],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                call_site="session_report"
             )
 
             return response.choices[0].message.content
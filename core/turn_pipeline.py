@@ -0,0 +1,155 @@
+# core/turn_pipeline.py
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from core.rag_engine import RAGEngine
+from core.session_memory import SessionMemory
+
+# 응답 조각 큐의 종료 표시
+_DONE = object()
+
+
+class TurnPipeline:
+    """채팅 한 턴의 비동기 처리 파이프라인
+
+    서로 독립적인 단계를 겹쳐 실행해 턴 지연 시간이 단계 합이 아니라 가장 느린 경로에 가깝도록 한다.
+
+        감정 분석 ─┐
+        위기 감지 ─┴─ 사용자 메시지 저장
+        유사 사례 검색 ── 응답 생성(AsyncOpenAI 스트리밍)
+
+    CPU 모델(감정 분석 BERT, 쿼리 인코딩)과 SQLite 저장은 스레드 풀에서 실행한다.
+    이벤트 루프와 스레드 풀은 프로세스당 하나를 공유한다 (AsyncOpenAI 연결 풀이 한 루프에 묶이도록).
+    """
+
+    _loop = None
+    _executor = None
+    _lock = threading.Lock()
+
+    def __init__(self, rag_engine: RAGEngine, emotion_analyzer, db_handler,
+                 crisis_detector: Callable[[str], bool], max_workers: int = 4,
+                 memory: Optional[SessionMemory] = None):
+        self.rag_engine = rag_engine
+        # 세션 누적 요약 메모리 (없으면 최근 대화만 사용)
+        self.memory = memory
+        self.emotion_analyzer = emotion_analyzer
+        self.db_handler = db_handler
+        self.crisis_detector = crisis_detector
+        with TurnPipeline._lock:
+            if TurnPipeline._loop is None:
+                TurnPipeline._loop = asyncio.new_event_loop()
+                threading.Thread(target=TurnPipeline._loop.run_forever, name="turn-loop", daemon=True).start()
+                TurnPipeline._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="turn")
+
+    async def _timed(self, timings: Dict, stage: str, func: Callable, *args):
+        """func 를 스레드 풀에서 실행하고 소요 시간(ms)을 timings[stage] 에 기록"""
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            timings[stage] = (time.perf_counter() - start) * 1000
+
+    async def _guarded(self, timings: Dict, errors: Dict, stage: str, default, func: Callable, *args):
+        """부가 단계(감정 분석, 위기 감지, 저장) 실행, 실패하면 errors[stage] 에 오류를 남기고 default 반환
+
+        부가 단계가 실패해도 이미 스트리밍한 응답은 그대로 돌려주기 위해 단계별로 예외를 막는다.
+        """
+        try:
+            return await self._timed(timings, f'{stage}_ms', func, *args)
+        except Exception as e:
+            print(f"턴 {stage} 단계 오류: {str(e)}")
+            errors[stage] = str(e)
+            return default
+
+    def _analyze_emotion(self, query: str) -> Optional[Dict]:
+        """감정 분석 (분석기가 돌려준 오류는 예외로 바꿔 _guarded 가 기록하게 함)"""
+        result = self.emotion_analyzer.analyze_emotion(query)
+        if result and 'error' in result:
+            raise RuntimeError(result['error'])
+        return result
+
+    async def run_turn(self, query: str, chat_history: List[Dict], session_id: int,
+                       on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """한 턴 처리
+
+        on_token 은 응답 조각이 도착할 때마다 이벤트 루프 스레드에서 호출된다.
+        {'response', 'emotion_result', 'emotion_detected', 'crisis_detected', 'message_id', 'degraded', 'errors',
+        'timings'} 를 반환한다. degraded 는 LLM 대신 대체 응답을 쓴 사유(없으면 None)다.
+        부가 단계가 실패하면 기본값(emotion_result None, crisis_detected False, message_id None)을 쓰고
+        errors 에 단계별 오류 메시지('emotion', 'crisis', 'save')를 남긴다.
+        timings 는 단계별 시간(ms): emotion_ms, crisis_ms, save_ms, retrieval_ms, generation_ms,
+        first_token_ms(턴 시작 기준), total_ms.
+        """
+        start = time.perf_counter()
+        timings = {}
+        errors = {}
+        degraded = None
+
+        emotion_task = asyncio.ensure_future(
+            self._guarded(timings, errors, 'emotion', None, self._analyze_emotion, query)
+        )
+        crisis_task = asyncio.ensure_future(
+            self._guarded(timings, errors, 'crisis', False, self.crisis_detector, query)
+        )
+
+        async def persist() -> Optional[int]:
+            emotion_result, crisis_detected = await asyncio.gather(emotion_task, crisis_task)
+            emotion_detected = emotion_result.get('dominant_emotion') if emotion_result else None
+            return await self._guarded(
+                timings, errors, 'save', None, self.db_handler.save_message,
+                session_id, "user", query, emotion_detected, crisis_detected
+            )
+
+        async def respond() -> str:
+            nonlocal degraded
+            cases = await self._timed(timings, 'retrieval_ms', self.rag_engine.retrieve_cases, query)
+            stream_timings = {}
+            tokens = []
+            stream = self.rag_engine.astream_response(query, chat_history, cases, stream_timings, self.memory)
+            async for token in stream:
+                if not tokens:
+                    timings['first_token_ms'] = (time.perf_counter() - start) * 1000
+                tokens.append(token)
+                if on_token is not None:
+                    on_token(token)
+            timings['generation_ms'] = stream_timings.get('total_ms', 0.0)
+            degraded = stream_timings.get('degraded')
+            return "".join(tokens)
+
+        response, message_id = await asyncio.gather(respond(), persist())
+        emotion_result = emotion_task.result()
+        timings['total_ms'] = (time.perf_counter() - start) * 1000
+        return {
+            'response': response,
+            'emotion_result': emotion_result,
+            'emotion_detected': emotion_result.get('dominant_emotion') if emotion_result else None,
+            'crisis_detected': crisis_task.result(),
+            'message_id': message_id,
+            'degraded': degraded,
+            'errors': errors,
+            'timings': timings
+        }
+
+    def run(self, query: str, chat_history: List[Dict], session_id: int,
+            on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """동기 코드(Streamlit 스크립트)에서 한 턴 실행
+
+        공유 이벤트 루프에서 run_turn 을 실행하고, on_token 은 호출한 스레드에서 실행한다
+        (Streamlit 요소 갱신은 스크립트 스레드에서만 가능).
+        """
+        tokens = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self.run_turn(query, chat_history, session_id, tokens.put), self._loop
+        )
+        future.add_done_callback(lambda _: tokens.put(_DONE))
+        while True:
+            token = tokens.get()
+            if token is _DONE:
+                break
+            if on_token is not None:
+                on_token(token)
+        return future.result()